@@ -0,0 +1,199 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# Classroom load scenario against a running api (flask run, gunicorn...)
+#
+#   python -m bench.classroom_load --url http://127.0.0.1:5000 --learners 30 --duration 120
+#
+# Each learner logs in, lists the challenges, creates a sequence then autosaves it (PUT /api/sequences/<id>),
+# comments it and sends it to process / back to wip. The teacher polls the sequences to process and the
+# challenges and marks sequences as processed. The group, learners, challenge and sequences are created
+# through the api as admin and removed at the end.
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+import requests
+
+import config
+
+from bench.endpoints import percentile
+
+class Recorder(object):
+    def __init__(self):
+        self.steps = {}
+
+    def call(self, step, session, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            r = session.request(method, url, timeout=30, **kwargs)
+            error = r.status_code >= 400
+        except requests.RequestException:
+            r = None
+            error = True
+        elapsed = (time.perf_counter() - start) * 1000
+
+        stats = self.steps.setdefault(step, {'latencies': [], 'errors': 0})
+        stats['latencies'].append(elapsed)
+        if error:
+            stats['errors'] += 1
+        return r
+
+    def merge(self, other):
+        for step, stats in other.steps.items():
+            mine = self.steps.setdefault(step, {'latencies': [], 'errors': 0})
+            mine['latencies'].extend(stats['latencies'])
+            mine['errors'] += stats['errors']
+
+def random_actions(count):
+    return [
+        {'position': i, 'type': 'move_relative', 'param': {'x_offset': random.randint(-100, 100), 'y_offset': random.randint(-100, 100)}}
+        for i in range(count)
+    ]
+
+def login(recorder, session, base_url, email, password):
+    r = recorder.call('login', session, 'POST', base_url + '/api/login', json={'email': email, 'password': password})
+    if r is None or r.status_code != 200:
+        raise RuntimeError('unable to log in as ' + email)
+    session.headers['Authorization'] = 'Bearer ' + r.json()['access_token']
+
+def learner(base_url, user, challenge_id, args, stop, recorder, sequences):
+    session = requests.Session()
+    login(recorder, session, base_url, user['email'], user['pseudo'])
+
+    recorder.call('list_challenges', session, 'GET', base_url + '/api/challenges')
+    r = recorder.call('create_sequence', session, 'POST', base_url + '/api/sequences', json={
+        'challenge_id': challenge_id,
+        'actions': random_actions(args.actions)
+    })
+    if r is None or r.status_code != 200:
+        return
+    sequence_id = r.json()['id']
+    sequences.append(sequence_id)
+    url = base_url + '/api/sequences/' + sequence_id
+
+    saves = 0
+    while not stop.is_set():
+        time.sleep(random.uniform(0.5, 1.5) * args.autosave_interval)
+        recorder.call('autosave_sequence', session, 'PUT', url, json={'actions': random_actions(args.actions)})
+        saves += 1
+        if saves % args.comment_every == 0:
+            recorder.call('comment_sequence', session, 'POST', url + '/comments', json={'comment': 'autosave ' + str(saves)})
+        if saves % args.submit_every == 0:
+            recorder.call('to_process', session, 'PUT', url + '/to_process', json={})
+            recorder.call('list_challenges', session, 'GET', base_url + '/api/challenges')
+            recorder.call('to_wip', session, 'PUT', url + '/to_wip', json={})
+
+def teacher(base_url, args, stop, recorder):
+    session = requests.Session()
+    login(recorder, session, base_url, config.getConfigKey('db.admin_email'), config.getConfigKey('db.admin_password'))
+
+    while not stop.is_set():
+        r = recorder.call('teacher_list_to_process', session, 'GET', base_url + '/api/sequences', params={'status': 'TO_PROCESS'})
+        recorder.call('teacher_list_challenges', session, 'GET', base_url + '/api/challenges')
+        if r is not None and r.status_code == 200 and r.json()['sequences']:
+            sequence = random.choice(r.json()['sequences'])
+            recorder.call('teacher_processed', session, 'PUT', base_url + '/api/sequences/' + str(sequence['id']) + '/processed', json={})
+        time.sleep(args.poll_interval)
+
+def setup(base_url, learners):
+    session = requests.Session()
+    login(Recorder(), session, base_url, config.getConfigKey('db.admin_email'), config.getConfigKey('db.admin_password'))
+
+    name = 'load-' + uuid.uuid4().hex[:8]
+    r = session.post(base_url + '/api/usergroups', json={'name': name, 'generate_learners': learners})
+    group = r.json()
+    r = session.post(base_url + '/api/challenges', json={
+        'title': name,
+        'end_date': time.strftime('%Y-%m-%d'),
+        'description': 'classroom load test',
+        'active': True,
+        'group_id': group['id']
+    })
+    return session, group, r.json()['id']
+
+def teardown(session, base_url, group, challenge_id, sequences):
+    for sequence_id in sequences:
+        session.delete(base_url + '/api/sequences/' + sequence_id)
+    session.delete(base_url + '/api/challenges/' + challenge_id)
+    for user in group['users']:
+        session.delete(base_url + '/api/users/' + str(user['id']))
+    session.delete(base_url + '/api/usergroups/' + str(group['id']))
+
+def report(recorder, duration):
+    result = {}
+    for step, stats in sorted(recorder.steps.items()):
+        latencies = stats['latencies']
+        result[step] = {
+            'requests': len(latencies),
+            'throughput_rps': round(len(latencies) / duration, 2),
+            'errors': stats['errors'],
+            'error_rate': round(stats['errors'] / len(latencies), 4) if latencies else 0,
+            'p50_ms': round(percentile(latencies, 0.5), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(max(latencies), 2)
+        }
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate a class of learners autosaving while a teacher polls')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='base url of the running api')
+    parser.add_argument('--learners', type=int, default=30)
+    parser.add_argument('--duration', type=float, default=60, help='seconds of steady load')
+    parser.add_argument('--actions', type=int, default=12, help='actions sent on each autosave')
+    parser.add_argument('--autosave-interval', type=float, default=2, help='mean seconds between two autosaves of a learner')
+    parser.add_argument('--comment-every', type=int, default=10, help='comment every n autosaves')
+    parser.add_argument('--submit-every', type=int, default=15, help='send to process every n autosaves')
+    parser.add_argument('--poll-interval', type=float, default=3, help='seconds between two teacher polls')
+    parser.add_argument('--output', help='write results as json to this file')
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    session, group, challenge_id = setup(base_url, args.learners)
+
+    stop = threading.Event()
+    sequences = []
+    recorders = []
+    threads = []
+    for user in group['users']:
+        recorder = Recorder()
+        recorders.append(recorder)
+        threads.append(threading.Thread(target=learner, args=(base_url, user, challenge_id, args, stop, recorder, sequences)))
+    recorder = Recorder()
+    recorders.append(recorder)
+    threads.append(threading.Thread(target=teacher, args=(base_url, args, stop, recorder)))
+
+    start = time.perf_counter()
+    try:
+        for t in threads:
+            t.start()
+        time.sleep(args.duration)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        duration = time.perf_counter() - start
+        teardown(session, base_url, group, challenge_id, sequences)
+
+    total = Recorder()
+    for r in recorders:
+        total.merge(r)
+    result = report(total, duration)
+
+    print('\n%-26s %8s %8s %8s %9s %9s %9s' % ('step', 'req', 'req/s', 'errors', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for step, stats in result.items():
+        print('%-26s %8d %8.2f %8d %9.1f %9.1f %9.1f' % (
+            step, stats['requests'], stats['throughput_rps'], stats['errors'], stats['p50_ms'], stats['p95_ms'], stats['p99_ms']
+        ))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps({'learners': args.learners, 'duration': round(duration, 2), 'steps': result}, indent=2))
+
+if __name__ == '__main__':
+    main()
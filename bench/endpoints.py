@@ -0,0 +1,182 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# Latency and query count of every list/detail endpoint and of send_to_farmbot, on a seeded dataset
+#
+#   python -m bench.endpoints --output bench_results.json
+#   python -m bench.endpoints --groups 40 --iterations 50 --compare previous_release.json
+#
+# Needs the database of config.json (migrated, with the admin of create_admin.py), the farmbot api
+# is replaced by the local stand-in of bench/farmbot_stub.py
+
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import time
+
+import config
+
+from bench import farmbot_stub
+from bench.seed import PASSWORD, PREFIX, add_arguments, clean, seed_from_args
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    k = (len(values) - 1) * p
+    f = int(k)
+    c = min(f + 1, len(values) - 1)
+    return values[f] + (values[c] - values[f]) * (k - f)
+
+def measure(client, method, url, token, iterations, warmup, body=None):
+    from db.query_stats import count_queries
+
+    headers = {'Authorization': 'Bearer ' + token}
+    for i in range(warmup):
+        client.open(url, method=method, headers=headers, json=body).get_data()
+
+    timings = []
+    queries = []
+    statuses = {}
+    size = 0
+    for i in range(iterations):
+        with count_queries() as stats:
+            start = time.perf_counter()
+            r = client.open(url, method=method, headers=headers, json=body)
+            size = len(r.get_data())
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(stats.count)
+        statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+    return {
+        'method': method,
+        'url': url,
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': max(queries),
+        'response_bytes': size,
+        'statuses': {str(k): v for k, v in statuses.items()}
+    }
+
+def login(client, email, password):
+    r = client.post('/api/login', json={'email': email, 'password': password})
+    if r.status_code != 200:
+        raise RuntimeError('unable to log in as ' + email)
+    return r.json['access_token']
+
+def scenarios(run):
+    from db.models import UserGroup, User, Challenge, Sequence, Pin
+
+    group = UserGroup.query.filter(UserGroup.name.like(PREFIX + run + '-%')).first()
+    learner = User.query.filter_by(group_id=group.id).first()
+    challenge = Challenge.query.filter_by(group_id=group.id).first()
+    sequence = Sequence.query.filter_by(user_id=learner.id, challenge_id=challenge.id).first()
+    pin = Pin.query.first()
+
+    return learner.email, [
+        ('pins.list', 'GET', '/api/pins', 'admin', None),
+        ('pins.detail', 'GET', '/api/pins/' + str(pin.id), 'admin', None),
+        ('usergroups.list', 'GET', '/api/usergroups', 'admin', None),
+        ('usergroups.detail', 'GET', '/api/usergroups/' + str(group.id), 'admin', None),
+        ('users.list', 'GET', '/api/users', 'admin', None),
+        ('users.detail', 'GET', '/api/users/' + str(learner.id), 'admin', None),
+        ('challenges.list', 'GET', '/api/challenges', 'admin', None),
+        ('challenges.list.learner', 'GET', '/api/challenges', 'learner', None),
+        ('challenges.detail', 'GET', '/api/challenges/' + str(challenge.id), 'admin', None),
+        ('sequences.list', 'GET', '/api/sequences', 'admin', None),
+        ('sequences.list.to_process', 'GET', '/api/sequences?status=TO_PROCESS', 'admin', None),
+        ('sequences.list.learner', 'GET', '/api/sequences', 'learner', None),
+        ('sequences.detail', 'GET', '/api/sequences/' + str(sequence.id), 'admin', None),
+        ('sequences.send_to_farmbot', 'PUT', '/api/sequences/' + str(sequence.id) + '/send_to_farmbot', 'admin', {})
+    ]
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(previous, current):
+    print('\n%-30s %12s %12s %8s %10s' % ('endpoint', 'p50 before', 'p50 now', 'delta', 'queries'))
+    for name, result in current['results'].items():
+        before = previous['results'].get(name)
+        if not before:
+            print('%-30s %12s %12.2f %8s %10s' % (name, '-', result['p50_ms'], '-', result['queries']))
+            continue
+        delta = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+        print('%-30s %12.2f %12.2f %+7.1f%% %4s -> %s' % (
+            name, before['p50_ms'], result['p50_ms'], delta, before['queries'], result['queries']
+        ))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every endpoint on a synthetic dataset')
+    add_arguments(parser)
+    parser.add_argument('--iterations', type=int, default=20, help='measured calls per endpoint')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured calls per endpoint')
+    parser.add_argument('--only', action='append', help='only run endpoints starting with this name')
+    parser.add_argument('--farmbot-latency', type=float, default=0, help='seconds added to every farmbot stand-in answer')
+    parser.add_argument('--output', help='write results as json to this file')
+    parser.add_argument('--compare', help='previous json results to compare with')
+    parser.add_argument('--keep', action='store_true', help='keep the seeded dataset')
+    args = parser.parse_args()
+
+    from app import create_app
+    from db.models import Pin
+
+    app = create_app()
+
+    with app.app_context():
+        dataset = seed_from_args(args)
+        pins = [{'action': p.action, 'material_type': p.material_type.value, 'material_id': p.material_id} for p in Pin.query.all()]
+
+    server, farmbot_url = farmbot_stub.start(latency=args.farmbot_latency, pins=pins)
+    config.override({'farmbot-api.url': farmbot_url})
+
+    results = {}
+    try:
+        client = app.test_client()
+        with app.app_context():
+            learner_email, endpoints = scenarios(dataset['run'])
+        tokens = {
+            'admin': login(client, config.getConfigKey('db.admin_email'), config.getConfigKey('db.admin_password')),
+            'learner': login(client, learner_email, PASSWORD)
+        }
+        for name, method, url, role, body in endpoints:
+            if args.only and not any(name.startswith(o) for o in args.only):
+                continue
+            results[name] = measure(client, method, url, tokens[role], args.iterations, args.warmup, body)
+            print('%-30s p50 %8.2f ms  p95 %8.2f ms  %4d queries' % (
+                name, results[name]['p50_ms'], results[name]['p95_ms'], results[name]['queries']
+            ))
+    finally:
+        server.shutdown()
+        if not args.keep:
+            with app.app_context():
+                clean()
+
+    output = {
+        'meta': {
+            'date': datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'iterations': args.iterations
+        },
+        'dataset': dataset,
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(output, indent=2, sort_keys=True))
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(json.loads(f.read()), output)
+
+if __name__ == '__main__':
+    main()
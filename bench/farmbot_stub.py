@@ -0,0 +1,96 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# Minimal local stand-in of the Farmbot web app api, enough for `send_to_farmbot`
+#
+#   python -m bench.farmbot_stub --port 8099   # then set farmbot-api.url to http://127.0.0.1:8099
+
+import argparse
+import itertools
+import json
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from bench.seed import PINS
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class FarmbotHandler(BaseHTTPRequestHandler):
+    sequence_ids = itertools.count(1)
+    latency = 0
+    # pins known by the farmbot, as returned by /peripherals and /sensors
+    pins = [{'action': p['action'], 'material_type': p['material_type'].value, 'material_id': p['material_id']} for p in PINS]
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body):
+        if self.latency:
+            time.sleep(self.latency)
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_POST(self):
+        if self.path == '/tokens':
+            self.body()
+            return self.reply(200, {
+                'token': {
+                    'encoded': 'bench-token',
+                    'unencoded': {'exp': int(time.time()) + 86400 * 30}
+                }
+            })
+        if self.path == '/sequences':
+            return self.reply(200, dict(self.body(), id=next(self.sequence_ids) % 30000 + 1))
+        return self.reply(404, {'error': 'not found'})
+
+    def do_PUT(self):
+        if self.path.startswith('/sequences/'):
+            return self.reply(200, dict(self.body(), id=int(self.path.split('/')[-1])))
+        return self.reply(404, {'error': 'not found'})
+
+    def do_DELETE(self):
+        return self.reply(200, {})
+
+    def do_GET(self):
+        for kind in ['peripheral', 'sensor']:
+            if self.path == '/' + kind + 's':
+                return self.reply(200, [
+                    {'id': 100 + i, 'pin': p['material_id'], 'mode': 0, 'label': p['action']}
+                    for i, p in enumerate(self.pins) if p['material_type'].lower() == kind
+                ])
+        return self.reply(404, {'error': 'not found'})
+
+def start(port=0, latency=0, pins=None):
+    FarmbotHandler.latency = latency
+    if pins is not None:
+        FarmbotHandler.pins = pins
+    server = ThreadingHTTPServer(('127.0.0.1', port), FarmbotHandler)
+    thread = threading.Thread(target=server.serve_forever, name='farmbot-stub', daemon=True)
+    thread.start()
+    return server, 'http://127.0.0.1:' + str(server.server_address[1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local Farmbot api stand-in')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0, help='seconds added to every answer')
+    args = parser.parse_args()
+
+    FarmbotHandler.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), FarmbotHandler)
+    print('farmbot stand-in listening on http://127.0.0.1:' + str(args.port))
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
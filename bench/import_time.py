@@ -0,0 +1,81 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# Import time report, based on `python -X importtime`
+#
+#   python -m bench.import_time                  # human readable report
+#   python -m bench.import_time --json out.json  # machine readable, to diff between releases
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    'models': 'import db.models',
+    'app_module': 'import app',
+    'create_app': 'import app; app.create_app()'
+}
+
+def run_importtime(statement):
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+    )
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+
+    modules = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us)
+        })
+    return modules
+
+def report(statement, top):
+    modules = run_importtime(statement)
+    return {
+        'statement': statement,
+        'total_us': sum(m['self_us'] for m in modules),
+        'module_count': len(modules),
+        'top_level': sorted(
+            [m for m in modules if m['depth'] == 0],
+            key=lambda m: m['cumulative_us'], reverse=True
+        )[:top],
+        'slowest': sorted(modules, key=lambda m: m['self_us'], reverse=True)[:top]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import time of the application entry points')
+    parser.add_argument('--target', action='append', choices=sorted(TARGETS), help='entry point to measure (default: all)')
+    parser.add_argument('--top', type=int, default=15, help='number of modules to list')
+    parser.add_argument('--json', dest='json_path', help='write results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    for target in args.target or sorted(TARGETS):
+        results[target] = report(TARGETS[target], args.top)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            f.write(json.dumps(results, indent=2))
+
+    for target, result in results.items():
+        print('\n%s: %s' % (target, result['statement']))
+        print('  total %.1f ms, %d modules' % (result['total_us'] / 1000, result['module_count']))
+        print('  top level imports (cumulative ms):')
+        for m in result['top_level']:
+            print('    %8.1f  %s' % (m['cumulative_us'] / 1000, m['module']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# Cost of loading Challenge.sequences and User.sequences with and without the JSONB payload, on a seeded dataset
+#
+#   python -m bench.relationship_load --groups 20 --iterations 10 --output relationship_load.json
+#
+# `payload` reads actions and comments with the sequences (the former behaviour, now undefer_payload),
+# `deferred` reads the other columns only (the default since they are deferred)
+
+import argparse
+import datetime
+import json
+import platform
+import time
+
+from sqlalchemy import func
+
+from bench.endpoints import git_revision, percentile
+from bench.seed import PREFIX, add_arguments, clean, seed_from_args
+
+MODES = ['payload', 'deferred']
+
+def load(parent, relationship, run, mode):
+    from db.models import undefer_payload
+
+    query = parent.query
+    if parent.__name__ == 'Challenge':
+        query = query.filter(parent.title.like(PREFIX + run + '-%'))
+    else:
+        query = query.filter(parent.email.like(PREFIX + run + '-%'))
+    if mode == 'payload':
+        query = query.options(undefer_payload(relationship))
+
+    rows = 0
+    for item in query.all():
+        # what the challenge and user lists read without `sequences` in the body: ids and status
+        rows += len([(s.id, s.status) for s in getattr(item, relationship.key)])
+    return rows
+
+def measure(parent, relationship, run, mode, iterations, warmup):
+    from db import conn
+    from db.query_stats import count_queries
+
+    db = conn.db
+    for i in range(warmup):
+        load(parent, relationship, run, mode)
+        db.session.remove()
+
+    timings = []
+    queries = []
+    rows = 0
+    for i in range(iterations):
+        with count_queries() as stats:
+            start = time.perf_counter()
+            rows = load(parent, relationship, run, mode)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(stats.count)
+        # a fresh session each time, nothing comes from the identity map
+        db.session.remove()
+
+    return {
+        'iterations': iterations,
+        'sequences': rows,
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries': max(queries)
+    }
+
+def payload_bytes(run):
+    from db import conn
+    from db.models import Challenge, Sequence
+
+    db = conn.db
+    challenges = db.session.query(Challenge.id).filter(Challenge.title.like(PREFIX + run + '-%'))
+    return db.session.query(
+        func.coalesce(func.sum(func.pg_column_size(Sequence.actions) + func.pg_column_size(Sequence.comments)), 0)
+    ).filter(Sequence.challenge_id.in_(challenges.subquery())).scalar()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark relationship loads of sequences with and without their JSONB payload')
+    add_arguments(parser)
+    parser.add_argument('--iterations', type=int, default=10, help='measured loads per relationship and mode')
+    parser.add_argument('--warmup', type=int, default=1, help='unmeasured loads per relationship and mode')
+    parser.add_argument('--output', help='write results as json to this file')
+    parser.add_argument('--keep', action='store_true', help='keep the seeded dataset')
+    args = parser.parse_args()
+
+    from app import create_app
+    from db.models import Challenge, User
+
+    app = create_app()
+
+    results = {}
+    with app.app_context():
+        dataset = seed_from_args(args)
+        try:
+            dataset['payload_bytes'] = int(payload_bytes(dataset['run']))
+            for parent, relationship in [(Challenge, Challenge.sequences), (User, User.sequences)]:
+                name = parent.__name__ + '.sequences'
+                results[name] = {}
+                for mode in MODES:
+                    results[name][mode] = measure(parent, relationship, dataset['run'], mode, args.iterations, args.warmup)
+                before, after = results[name]['payload'], results[name]['deferred']
+                print('%-20s %6d sequences  payload p50 %8.2f ms  deferred p50 %8.2f ms  x%.2f  %d -> %d queries' % (
+                    name, after['sequences'], before['p50_ms'], after['p50_ms'],
+                    before['p50_ms'] / after['p50_ms'] if after['p50_ms'] else 0,
+                    before['queries'], after['queries']
+                ))
+            print('payload not read by the deferred loads: %.1f kB' % (dataset['payload_bytes'] / 1024.0))
+        finally:
+            if not args.keep:
+                clean()
+
+    output = {
+        'meta': {
+            'date': datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'iterations': args.iterations
+        },
+        'dataset': dataset,
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(output, indent=2, sort_keys=True))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# Synthetic school-scale dataset for the benchmarks
+#
+#   python -m bench.seed --groups 40 --learners 30 --challenges 5
+#   python -m bench.seed --clean
+#
+# Every seeded row is prefixed with `bench-` so it can be removed without touching real data. Pins are looked up by
+# their action, so they keep it and are marked by their id instead (see pin_id)
+
+import argparse
+import datetime
+import random
+import uuid
+
+from werkzeug.security import generate_password_hash
+
+from db import conn
+from db.models import UserGroup, User, UserRoles, Challenge, Sequence, Pin, MaterialTypes
+from db.models.sequence import SequenceStatus
+
+db = conn.db
+
+PREFIX = 'bench-'
+PASSWORD = 'bench_password'
+
+PINS = [
+    {'action': 'water', 'material_type': MaterialTypes.PERIPHERAL, 'material_id': 8},
+    {'action': 'vacuum', 'material_type': MaterialTypes.PERIPHERAL, 'material_id': 9},
+    {'action': 'humidity', 'material_type': MaterialTypes.SENSOR, 'material_id': 59}
+]
+
+def random_action(position):
+    action_type = random.choice(['find_home', 'move_absolute', 'move_relative', 'take_photo', 'wait', 'water'])
+    param = {}
+    if action_type == 'find_home':
+        param = {'value': random.choice(['all', 'x', 'y', 'z'])}
+    if action_type == 'move_absolute':
+        param = {
+            'x_value': random.randint(0, 2900),
+            'y_value': random.randint(0, 1400),
+            'z_value': random.randint(-400, 0),
+            'x_speed': random.randint(10, 100)
+        }
+    if action_type == 'move_relative':
+        param = {
+            'x_offset': random.randint(-200, 200),
+            'y_offset': random.randint(-200, 200),
+            'z_variance': random.randint(0, 20)
+        }
+    if action_type == 'wait':
+        param = {'milliseconds': random.randint(100, 5000)}
+    if action_type == 'water':
+        param = {'type': 'write', 'value': random.choice([0, 1])}
+    return {'position': position, 'type': action_type, 'param': param}
+
+def random_comments(users, count):
+    return [
+        {
+            'user': {'id': str(u['id']), 'pseudo': u['pseudo']},
+            'comment': 'Commentaire de test numéro ' + str(i) + ' ' + 'x' * random.randint(20, 200)
+        }
+        for i, u in enumerate(random.sample(users, min(count, len(users))))
+    ]
+
+def pin_id(pin):
+    # the same id in every run, which clean() finds without having to keep track of the seeded pins
+    return uuid.uuid5(uuid.NAMESPACE_URL, PREFIX + pin['action'])
+
+def seed_pins(now):
+    pins = []
+    for p in PINS:
+        if not Pin.query.filter((Pin.action == p['action']) | (Pin.material_id == p['material_id'])).first():
+            pins.append(dict(p, id=pin_id(p), created_at=now, updated_at=now))
+    if pins:
+        db.session.execute(Pin.__table__.insert(), pins)
+
+def seed(groups=10, learners=30, challenges=5, sequences_per_learner=1, actions=12, comments=3, run=None):
+    run = run or uuid.uuid4().hex[:6]
+    now = datetime.datetime.utcnow()
+    password = generate_password_hash(PASSWORD)
+
+    seed_pins(now)
+
+    counts = {'groups': 0, 'users': 0, 'challenges': 0, 'sequences': 0}
+    for g in range(groups):
+        group_id = uuid.uuid4()
+        db.session.execute(UserGroup.__table__.insert(), [{
+            'id': group_id, 'name': PREFIX + run + '-group-' + str(g), 'created_at': now, 'updated_at': now
+        }])
+
+        users = [
+            {
+                'id': uuid.uuid4(),
+                'pseudo': PREFIX + run + '-' + str(g) + '-' + str(u),
+                'name': 'Learner ' + str(u),
+                'email': PREFIX + run + '-' + str(g) + '-' + str(u) + '@bench.local',
+                'password': password,
+                'role': UserRoles.USER,
+                'group_id': group_id,
+                'created_at': now - datetime.timedelta(minutes=u),
+                'updated_at': now - datetime.timedelta(minutes=u)
+            }
+            for u in range(learners)
+        ]
+        db.session.execute(User.__table__.insert(), users)
+
+        group_challenges = [
+            {
+                'id': uuid.uuid4(),
+                'title': PREFIX + run + '-challenge-' + str(g) + '-' + str(c),
+                'end_date': now + datetime.timedelta(days=30),
+                'description': 'Défi de test ' + str(c),
+                'active': True,
+                'group_id': group_id,
+                'created_at': now - datetime.timedelta(days=c),
+                'updated_at': now - datetime.timedelta(days=c)
+            }
+            for c in range(challenges)
+        ]
+        db.session.execute(Challenge.__table__.insert(), group_challenges)
+
+        sequences = []
+        for u in users:
+            for c in group_challenges:
+                for s in range(sequences_per_learner):
+                    sequences.append({
+                        'id': uuid.uuid4(),
+                        'user_id': u['id'],
+                        'challenge_id': c['id'],
+                        'status': random.choice(list(SequenceStatus)),
+                        'actions': [random_action(i) for i in range(actions)],
+                        'fb_seq_id': None,
+                        'comments': random_comments(users, comments),
+                        'created_at': now - datetime.timedelta(seconds=random.randint(0, 86400 * 30)),
+                        'updated_at': now - datetime.timedelta(seconds=random.randint(0, 86400))
+                    })
+        if sequences:
+            db.session.execute(Sequence.__table__.insert(), sequences)
+
+        counts['groups'] += 1
+        counts['users'] += len(users)
+        counts['challenges'] += len(group_challenges)
+        counts['sequences'] += len(sequences)
+
+    db.session.commit()
+    return dict(counts, run=run)
+
+def clean():
+    bench_users = db.session.query(User.id).filter(User.email.like(PREFIX + '%'))
+    bench_challenges = db.session.query(Challenge.id).filter(Challenge.title.like(PREFIX + '%'))
+    Sequence.query.filter(
+        Sequence.user_id.in_(bench_users.subquery()) | Sequence.challenge_id.in_(bench_challenges.subquery())
+    ).delete(synchronize_session=False)
+    Challenge.query.filter(Challenge.title.like(PREFIX + '%')).delete(synchronize_session=False)
+    User.query.filter(User.email.like(PREFIX + '%')).delete(synchronize_session=False)
+    UserGroup.query.filter(UserGroup.name.like(PREFIX + '%')).delete(synchronize_session=False)
+    Pin.query.filter(Pin.id.in_([pin_id(p) for p in PINS])).delete(synchronize_session=False)
+    db.session.commit()
+
+def add_arguments(parser):
+    parser.add_argument('--groups', type=int, default=10, help='number of user groups')
+    parser.add_argument('--learners', type=int, default=30, help='learners per group')
+    parser.add_argument('--challenges', type=int, default=5, help='challenges per group')
+    parser.add_argument('--sequences', type=int, default=1, help='sequences per learner and challenge')
+    parser.add_argument('--actions', type=int, default=12, help='actions per sequence')
+    parser.add_argument('--comments', type=int, default=3, help='comments per sequence')
+    parser.add_argument('--random-seed', type=int, default=42, help='seed of the random generator')
+
+def seed_from_args(args):
+    random.seed(args.random_seed)
+    return seed(
+        groups=args.groups,
+        learners=args.learners,
+        challenges=args.challenges,
+        sequences_per_learner=args.sequences,
+        actions=args.actions,
+        comments=args.comments
+    )
+
+def main():
+    from db.app import app
+
+    parser = argparse.ArgumentParser(description='Seed or remove the benchmark dataset')
+    add_arguments(parser)
+    parser.add_argument('--clean', action='store_true', help='remove every seeded row and exit')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.clean:
+            clean()
+            print('benchmark dataset removed')
+        else:
+            print(seed_from_args(args))
+
+if __name__ == '__main__':
+    main()
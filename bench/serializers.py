@@ -0,0 +1,122 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# Per row cost of utils.model.as_dict against the reflective implementation it replaced
+#
+#   python -m bench.serializers --rows 2000
+#
+# Runs on transient model instances, no database needed. Fails if both implementations differ on any row.
+
+import argparse
+import datetime
+import json
+import random
+import time
+import uuid
+
+from utils.model import as_dict
+
+def reflective_as_dict(obj, **kwargs):
+    # utils.model.as_dict before the compiled serializers, kept as the reference
+    special_fields = kwargs.get('special_fields')
+    fields = [f.name for f in obj.__table__.columns]
+    loaded_fields = [f for f in fields if f not in kwargs.get('unloaded_fields')] if kwargs.get('unloaded_fields') else fields
+    result = {}
+    for c in loaded_fields:
+        if not special_fields or c not in special_fields:
+            if c == 'created_at' or c == 'updated_at':
+                result[c] = getattr(obj, c).strftime('%Y-%m-%d %H:%M:%S') if getattr(obj, c) else None
+            else:
+                result[c] = getattr(obj, c)
+        elif special_fields[c] == 'enum':
+            result[c] = {
+                'code': getattr(obj, c).name if getattr(obj, c) else None,
+                'label': getattr(obj, c).value if getattr(obj, c) else None
+            }
+        elif special_fields[c] == 'date':
+            result[c] = getattr(obj, c).strftime('%Y-%m-%d') if getattr(obj, c) else None
+        elif special_fields[c] == 'datetime':
+            result[c] = getattr(obj, c).strftime('%Y-%m-%d %H:%M:%S') if getattr(obj, c) else None
+        else:
+            result[c] = getattr(obj, c)
+    return result
+
+def build_rows(count):
+    from db.models import Challenge, Pin, MaterialTypes, Sequence, User, UserRoles
+    from db.models.sequence import SequenceStatus
+
+    now = datetime.datetime.utcnow()
+    users = []
+    challenges = []
+    sequences = []
+    pins = []
+    for i in range(count):
+        user = User(pseudo='user-' + str(i), name='User ' + str(i), email='user-' + str(i), password='hash',
+                    role=random.choice(list(UserRoles)), group_id=uuid.uuid4(), created_at=now, updated_at=now)
+        user.id = uuid.uuid4()
+        users.append(user)
+
+        challenge = Challenge(title='challenge-' + str(i), end_date=now if i % 2 else None, description='description',
+                              active=True, group_id=uuid.uuid4(), created_at=now, updated_at=None)
+        challenge.id = uuid.uuid4()
+        challenges.append(challenge)
+
+        sequence = Sequence(user_id=user.id, challenge_id=challenge.id, status=random.choice(list(SequenceStatus)),
+                            actions=[{'type': 'move_relative', 'x': i}], comments=[], created_at=now, updated_at=now)
+        sequence.id = uuid.uuid4()
+        sequences.append(sequence)
+
+        pin = Pin(action='action-' + str(i), material_type=MaterialTypes.PERIPHERAL, material_id=i, created_at=now, updated_at=now)
+        pin.id = uuid.uuid4()
+        pins.append(pin)
+
+    return [
+        ('user', users, {'unloaded_fields': ['password'], 'special_fields': {'role': 'enum'}}),
+        ('challenge', challenges, {'special_fields': {'end_date': 'date'}}),
+        ('challenge.group', challenges, {'unloaded_fields': ['group_id'], 'special_fields': {'end_date': 'date'}}),
+        ('sequence', sequences, {'special_fields': {'status': 'enum'}}),
+        ('sequence.challenge', sequences, {'unloaded_fields': ['challenge_id'], 'special_fields': {'status': 'enum'}}),
+        ('pin', pins, {})
+    ]
+
+def per_row(fn, rows, kwargs, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for row in rows:
+            fn(row, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return best / len(rows) * 1000000
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare compiled and reflective model serializers')
+    parser.add_argument('--rows', type=int, default=2000, help='rows per model')
+    parser.add_argument('--repeat', type=int, default=5, help='best of n runs')
+    parser.add_argument('--output', help='write results as json to this file')
+    args = parser.parse_args()
+
+    results = {}
+    print('%-20s %14s %14s %8s' % ('case', 'reflective us', 'compiled us', 'speedup'))
+    for name, rows, kwargs in build_rows(args.rows):
+        for row in rows:
+            expected = reflective_as_dict(row, **kwargs)
+            got = as_dict(row, **kwargs)
+            if json.dumps(expected, default=str) != json.dumps(got, default=str):
+                raise SystemExit('%s differs: %r != %r' % (name, expected, got))
+
+        reflective = per_row(reflective_as_dict, rows, kwargs, args.repeat)
+        compiled = per_row(as_dict, rows, kwargs, args.repeat)
+        results[name] = {
+            'reflective_us': round(reflective, 3),
+            'compiled_us': round(compiled, 3),
+            'speedup': round(reflective / compiled, 2)
+        }
+        print('%-20s %14.3f %14.3f %7.2fx' % (name, reflective, compiled, reflective / compiled))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results, indent=2, sort_keys=True))
+
+if __name__ == '__main__':
+    main()
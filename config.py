@@ -3,6 +3,8 @@
 import json
 import os
 import os.path
+import threading
+import time
 
 CC_MATCH = {
     "farmbot-api.url": "FARMBOT_API_URL",
@@ -13,20 +15,197 @@ CC_MATCH = {
     "db.name": "POSTGRESQL_ADDON_DB",
     "db.user": "POSTGRESQL_ADDON_USER",
     "db.password": "POSTGRESQL_ADDON_PASSWORD",
+    "db.replica_url": "POSTGRESQL_REPLICA_URL",
+    "db.pool_size": "DB_POOL_SIZE",
+    "db.max_overflow": "DB_MAX_OVERFLOW",
+    "db.pool_timeout": "DB_POOL_TIMEOUT",
+    "db.pool_recycle": "DB_POOL_RECYCLE",
+    "db.pool_pre_ping": "DB_POOL_PRE_PING",
+    "db.pool_stats_dir": "DB_POOL_STATS_DIR",
+    "db.statement_timeout": "DB_STATEMENT_TIMEOUT",
+    "db.idle_in_transaction_session_timeout": "DB_IDLE_IN_TRANSACTION_SESSION_TIMEOUT",
+    "docs.mode": "DOCS_MODE",
+    "docs.spec_file": "DOCS_SPEC_FILE",
+    "docs.cache_max_age": "DOCS_CACHE_MAX_AGE",
+    "metrics.enabled": "METRICS_ENABLED",
+    "json.provider": "JSON_PROVIDER",
+    "api.stream_lists": "API_STREAM_LISTS",
+    "api.stream_batch_size": "API_STREAM_BATCH_SIZE",
+    "api.conditional_requests": "API_CONDITIONAL_REQUESTS",
+    "api.page_size": "API_PAGE_SIZE",
+    "compression.enabled": "COMPRESSION_ENABLED",
+    "compression.min_size": "COMPRESSION_MIN_SIZE",
+    "compression.gzip_level": "COMPRESSION_GZIP_LEVEL",
+    "compression.brotli_quality": "COMPRESSION_BROTLI_QUALITY",
+    "compression.cache_size": "COMPRESSION_CACHE_SIZE",
+    "msgpack.enabled": "MSGPACK_ENABLED",
+    "debug.query_headers": "DEBUG_QUERY_HEADERS",
+    "debug.n_plus_one_threshold": "DEBUG_N_PLUS_ONE_THRESHOLD",
+    "profiling.dir": "PROFILING_DIR",
+    "profiling.keep": "PROFILING_KEEP",
     "jwt.secret_key": "JWT_SECRET_KEY",
     "jwt.expiration_time": "JWT_EXPIRATION_TIME"
 }
 
-def getConfigKey(key):
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), 'config.json')
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ['true', '1']
+
+# keys that are not strings, converted once when a snapshot is built: environment variables are always strings
+TYPES = {
+    "db.pool_size": int,
+    "db.max_overflow": int,
+    "db.pool_timeout": int,
+    "db.pool_recycle": int,
+    "db.pool_pre_ping": to_bool,
+    "db.statement_timeout": int,
+    "db.idle_in_transaction_session_timeout": int,
+    "docs.cache_max_age": int,
+    "metrics.enabled": to_bool,
+    "api.stream_lists": to_bool,
+    "api.stream_batch_size": int,
+    "api.conditional_requests": to_bool,
+    "api.page_size": int,
+    "compression.enabled": to_bool,
+    "compression.min_size": int,
+    "compression.gzip_level": int,
+    "compression.brotli_quality": int,
+    "compression.cache_size": int,
+    "msgpack.enabled": to_bool,
+    "debug.query_headers": to_bool,
+    "debug.n_plus_one_threshold": int,
+    "profiling.keep": int,
+    "jwt.expiration_time": int
+}
+
+_MISSING = object()
+
+class Settings(object):
+    # immutable snapshot of the configuration, keyed by dotted path
+    def __init__(self, values, mtime=None):
+        self.values = values
+        self.mtime = mtime
+
+    def get(self, key, default=_MISSING):
+        value = self.values.get(key, _MISSING)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        if value is None and default is not _MISSING:
+            return default
+        return value
+
+def flatten(tree, prefix=''):
+    flat = {}
+    for k, v in tree.items():
+        key = prefix + k
+        flat[key] = v
+        if isinstance(v, dict):
+            flat.update(flatten(v, key + '.'))
+    return flat
+
+def coerce(values):
+    typed = dict(values)
+    for key, value in values.items():
+        if key not in TYPES or value is None:
+            continue
+        if value == '':
+            # unset environment variable, getConfigKey returns the default of the caller
+            typed[key] = None
+            continue
+        try:
+            typed[key] = TYPES[key](value)
+        except (TypeError, ValueError):
+            raise ValueError('config key %s: %r is not a valid %s' % (key, value, TYPES[key].__name__))
+    return typed
+
+def load_settings():
+    if os.getenv('CC_ENV'):
+        return Settings(coerce({key: os.getenv(env) for key, env in CC_MATCH.items()}))
+
+    with open(CONFIG_FILE, 'r') as f:
+        mtime = os.fstat(f.fileno()).st_mtime
+        return Settings(coerce(flatten(json.loads(f.read()))), mtime)
+
+_settings = None
+# set by override(), applied again on top of every reload
+_overrides = {}
+_lock = threading.Lock()
+
+def with_overrides(loaded):
+    if not _overrides:
+        return loaded
+    values = dict(loaded.values)
+    values.update(_overrides)
+    return Settings(values, loaded.mtime)
+
+def settings():
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                _settings = with_overrides(load_settings())
+    return _settings
+
+def reload():
+    # the new snapshot is fully built before being swapped in, readers never see a partial config
+    global _settings
+    new_settings = with_overrides(load_settings())
+    _settings = new_settings
+    return new_settings
+
+def override(values):
+    # replace some keys, e.g. to point the farmbot api at a local stand-in, until the end of the process
+    global _settings
+    _overrides.update(coerce(values))
+    _settings = with_overrides(settings())
+    return _settings
+
+def reload_if_changed():
     if os.getenv('CC_ENV'):
-        return os.getenv(CC_MATCH[key])
-    else:
-        tree = key.split('.')
-        keyValue = None
-        project_root = os.path.dirname(__file__)
-        with open(os.path.join(project_root, 'config.json'), 'r') as f:
-            conf = f.read()
-            keyValue = json.loads(conf)
-            for k in tree:
-                keyValue = keyValue[k]
-        return keyValue
+        return False
+    try:
+        mtime = os.stat(CONFIG_FILE).st_mtime
+    except OSError:
+        return False
+    if _settings is not None and _settings.mtime == mtime:
+        return False
+    reload()
+    return True
+
+_watcher = None
+
+def watch(interval=5):
+    # poll config.json mtime from a daemon thread, request path lookups stay syscall free. Threads do not
+    # survive a fork: with `gunicorn --preload` the app is built in the master, post_fork starts it in the workers
+    global _watcher
+    if _watcher is not None and _watcher.is_alive():
+        return _watcher
+
+    def _watch():
+        while True:
+            time.sleep(interval)
+            try:
+                reload_if_changed()
+            except (OSError, ValueError):
+                # file being rewritten or invalid json, keep the previous snapshot
+                pass
+
+    _watcher = threading.Thread(target=_watch, name='config-watch', daemon=True)
+    _watcher.start()
+    return _watcher
+
+def watch_interval():
+    return int(os.getenv('CONFIG_WATCH_INTERVAL') or 0)
+
+def post_fork(server, worker):
+    # gunicorn hook, restarts the watcher in every worker
+    if watch_interval():
+        watch(watch_interval())
+
+def getConfigKey(key, default=_MISSING):
+    return settings().get(key, default)
@@ -4,12 +4,25 @@
 import pytest
 import config
 import json
-from app import app as testapp
+from contextlib import contextmanager
+from app import create_app
+from db.query_stats import count_queries
+
+testapp = create_app()
 
 @pytest.fixture
 def app():
     return testapp
 
+@pytest.fixture
+def max_queries():
+    @contextmanager
+    def _max(n):
+        with count_queries() as stats:
+            yield stats
+        assert stats.count <= n, 'expected at most %d queries, got %d: %s' % (n, stats.count, list(stats.statements))
+    return _max
+
 def check_response(response, **kwargs):
     status = kwargs.get('expected_status', None)
     error_key = kwargs.get('expected_error_key', None)
@@ -3,15 +3,17 @@ import config
 from werkzeug.security import generate_password_hash
 
 from db import conn
+from db.app import app
 from db.models import User
 
 db = conn.db
 
-me = User(
-    email=config.getConfigKey('db.admin_email'),
-    password=generate_password_hash(config.getConfigKey('db.admin_password')),
-    pseudo=config.getConfigKey('db.admin_pseudo'),
-    role='ADMIN'
-)
-db.session.add(me)
-db.session.commit()
\ No newline at end of file
+with app.app_context():
+    me = User(
+        email=config.getConfigKey('db.admin_email'),
+        password=generate_password_hash(config.getConfigKey('db.admin_password')),
+        pseudo=config.getConfigKey('db.admin_pseudo'),
+        role='ADMIN'
+    )
+    db.session.add(me)
+    db.session.commit()
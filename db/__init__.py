@@ -1,24 +1,56 @@
 #!/usr/bin/python
 #coding: utf-8
 
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-
 import config
 
-db_param = {
-    "host": config.getConfigKey('db.host'),
-    "port": config.getConfigKey('db.port'),
-    "name": config.getConfigKey('db.name'),
-    "user": config.getConfigKey('db.user'),
-    "password": config.getConfigKey('db.password')
-}
+from db.pool import StatsQueuePool, engine_options
+from db.routing import RoutingSQLAlchemy, REPLICA
+
+def database_uri():
+    db_param = {
+        "host": config.getConfigKey('db.host'),
+        "port": config.getConfigKey('db.port'),
+        "name": config.getConfigKey('db.name'),
+        "user": config.getConfigKey('db.user'),
+        "password": config.getConfigKey('db.password')
+    }
+    return 'postgresql://'+db_param['user']+':'+db_param['password']+'@'+db_param['host']+':'+db_param['port']+'/'+db_param['name']
+
+def pool_options():
+    pool_param = {
+        "pool_size": config.getConfigKey('db.pool_size', 5),
+        "max_overflow": config.getConfigKey('db.max_overflow', 10),
+        "pool_timeout": config.getConfigKey('db.pool_timeout', 30),
+        "pool_recycle": config.getConfigKey('db.pool_recycle', 1800),
+        "pre_ping": config.getConfigKey('db.pool_pre_ping', True),
+        "statement_timeout": config.getConfigKey('db.statement_timeout', 0),
+        "idle_in_transaction_session_timeout": config.getConfigKey('db.idle_in_transaction_session_timeout', 0)
+    }
+    return engine_options(**pool_param)
 
 class conn():
-    app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://'+db_param['user']+':'+db_param['password']+'@'+db_param['host']+':'+db_param['port']+'/'+db_param['name']
+    # the engine is only created when the first query runs, models can be imported without any config or database
+    db = RoutingSQLAlchemy()
+
+def init_app(app):
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = pool_options()
+
+    replica_url = config.getConfigKey('db.replica_url', None)
+    if replica_url:
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA: replica_url}
+
+    StatsQueuePool.stats_dir = config.getConfigKey('db.pool_stats_dir', None)
+
+    conn.db.init_app(app)
+
+    return app
+
+def init_migrate(app):
+    # alembic is heavy to import and only needed by the `flask db` commands
+    from flask_migrate import Migrate
+
+    Migrate(app, conn.db)
 
-    db = SQLAlchemy(app)
-    migrate = Migrate(app, db)
+    return app
@@ -1,7 +1,12 @@
 #!/usr/bin/python
 #coding: utf-8
 
-from db import conn
+from flask import Flask
+
+from db import conn, init_app, init_migrate
 from db.models import User, UserRoles, Challenge, Sequence
 
-app = conn.app
\ No newline at end of file
+# minimal application for `flask db` and scripts: no resources, jwt or api docs
+app = Flask(__name__)
+init_app(app)
+init_migrate(app)
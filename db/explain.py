@@ -0,0 +1,36 @@
+#!/usr/bin/python
+#coding: utf-8
+
+import json
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from db import conn
+
+db = conn.db
+
+class Explain(Executable, ClauseElement):
+    # EXPLAIN of a statement, bound parameters go through their types (uuids, enums) like in the statement itself
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(Explain, 'postgresql')
+def compile_explain(element, compiler, **kw):
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+def explain(query):
+    # the plan postgres picks for a query, root node of EXPLAIN (FORMAT JSON)
+    plan = db.session.execute(Explain(query.statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        for node in plan_nodes(child):
+            yield node
+
+def plan_indexes(plan):
+    return set(node['Index Name'] for node in plan_nodes(plan) if 'Index Name' in node)
@@ -0,0 +1,25 @@
+# Helpers of the migrations that build indexes with CREATE INDEX CONCURRENTLY, which does not lock writes but
+# cannot run in a transaction: call them inside `op.get_context().autocommit_block()`
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def index_state(name):
+    # None when there is no such index, indisvalid otherwise: false for the leftover of a failed concurrent build
+    return op.get_bind().execute(
+        sa.text('SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)'),
+        name=name
+    ).scalar()
+
+
+def create_index_concurrently(name, table, columns):
+    # a valid index is kept as it is, an invalid one is dropped and built again: a migration that failed can be
+    # run again. Offline (--sql) the state can not be read, the index is created
+    if not op.get_context().as_sql:
+        valid = index_state(name)
+        if valid:
+            return
+        if valid is not None:
+            op.execute('DROP INDEX CONCURRENTLY %s' % name)
+    op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
@@ -0,0 +1,29 @@
+"""Add index on challenge end date
+
+Revision ID: a71e5b03c9d4
+Revises: f3a8c2d91b47
+Create Date: 2026-10-18 15:41:09.275318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from db.migrations.concurrent_index import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = 'a71e5b03c9d4'
+down_revision = 'f3a8c2d91b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # sort key of the challenges list, built without locking writes (see db.migrations.concurrent_index)
+    with op.get_context().autocommit_block():
+        create_index_concurrently('ix_challenge_end_date_id', 'challenge', ['end_date', 'id'])
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_challenge_end_date_id', table_name='challenge', postgresql_concurrently=True)
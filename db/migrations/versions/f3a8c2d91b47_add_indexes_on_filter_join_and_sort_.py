@@ -0,0 +1,47 @@
+"""Add indexes on filter, join and sort columns
+
+Revision ID: f3a8c2d91b47
+Revises: 3116425a9f9d
+Create Date: 2026-10-18 10:12:37.418203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from db.migrations.concurrent_index import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c2d91b47'
+down_revision = '3116425a9f9d'
+branch_labels = None
+depends_on = None
+
+# same indexes as the __table_args__ of db.models, where the queries they serve are listed
+INDEXES = [
+    ('ix_sequence_user_id_status_created_at', 'sequence', ['user_id', 'status', 'created_at']),
+    ('ix_sequence_challenge_id', 'sequence', ['challenge_id']),
+    ('ix_sequence_status_created_at', 'sequence', ['status', 'created_at']),
+    ('ix_sequence_created_at_id', 'sequence', ['created_at', 'id']),
+    ('ix_sequence_updated_at', 'sequence', ['updated_at']),
+    ('ix_challenge_group_id_created_at', 'challenge', ['group_id', 'created_at']),
+    ('ix_challenge_created_at_id', 'challenge', ['created_at', 'id']),
+    ('ix_challenge_updated_at', 'challenge', ['updated_at']),
+    ('ix_user_group_id', 'user', ['group_id']),
+    ('ix_user_created_at_id', 'user', ['created_at', 'id']),
+    ('ix_user_updated_at', 'user', ['updated_at']),
+    ('ix_user_group_created_at_id', 'user_group', ['created_at', 'id']),
+]
+
+
+def upgrade():
+    # built without locking writes, see db.migrations.concurrent_index
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            create_index_concurrently(name, table, columns)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
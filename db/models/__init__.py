@@ -3,4 +3,4 @@ from db.models.pin import Pin,MaterialTypes
 from db.models.usergroup import UserGroup
 from db.models.user import User, UserRoles
 from db.models.challenge import Challenge
-from db.models.sequence import Sequence
\ No newline at end of file
+from db.models.sequence import Sequence, undefer_payload
\ No newline at end of file
@@ -49,6 +49,17 @@ class Challenge(db.Model):
     updated_at = db.Column(db.DateTime, nullable=not is_mandatory(field_list, 'updated_at'), default=datetime.datetime.utcnow)
     sequences = db.relationship("Sequence", backref="challenge")
 
+    __table_args__ = (
+        # learner lists (group_id filter) and UserGroup.challenges loads
+        db.Index('ix_challenge_group_id_created_at', 'group_id', 'created_at'),
+        # created_at sort of /api/challenges, the default one of its cursor pages
+        db.Index('ix_challenge_created_at_id', 'created_at', 'id'),
+        # Last-Modified and ETag of /api/challenges, max(updated_at)
+        db.Index('ix_challenge_updated_at', 'updated_at'),
+        # end_date sort of /api/challenges
+        db.Index('ix_challenge_end_date_id', 'end_date', 'id'),
+    )
+
     def __init__(self, **kwargs):
         self.title = kwargs.get('title', None)
         self.end_date = kwargs.get('end_date', None)
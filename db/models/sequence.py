@@ -2,15 +2,26 @@
 #coding: utf-8
 
 from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import deferred, defaultload, undefer_group
 from enum import Enum
 import uuid, datetime
 
-from utils.model import is_mandatory, mandatory_fields, not_allow_empty_fields, as_dict as model_as_dict
+from utils.model import is_mandatory, mandatory_fields, not_allow_empty_fields
+from utils.serializers import sequence_nested
 
 from db import conn
 
 db = conn.db
 
+PAYLOAD = 'payload'
+
+def undefer_payload(relationship=None):
+    # loader option reading actions and comments with the sequence row, on a Sequence query
+    # or along a relationship (Challenge.sequences, User.sequences)
+    if relationship is None:
+        return undefer_group(PAYLOAD)
+    return defaultload(relationship).undefer_group(PAYLOAD)
+
 class SequenceStatus(Enum):
     WIP = "En cours"
     TO_PROCESS = "A traiter"
@@ -51,12 +62,26 @@ class Sequence(db.Model):
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('user.id'), nullable=not is_mandatory(field_list, 'user_id'))
     challenge_id = db.Column(UUID(as_uuid=True), db.ForeignKey('challenge.id'), nullable=not is_mandatory(field_list, 'challenge_id'))
     status = db.Column(db.Enum(SequenceStatus), nullable=not is_mandatory(field_list, 'status'))
-    actions = db.Column(JSONB(),  nullable=not is_mandatory(field_list, 'actions'))
+    # the JSONB payload is only read by the queries asking for it, see undefer_payload
+    actions = deferred(db.Column(JSONB(),  nullable=not is_mandatory(field_list, 'actions')), group=PAYLOAD)
     fb_seq_id = db.Column(db.SMALLINT(), nullable=not is_mandatory(field_list, 'fb_seq_id'))
-    comments = db.Column(JSONB(),  nullable=not is_mandatory(field_list, 'comments'))
+    comments = deferred(db.Column(JSONB(),  nullable=not is_mandatory(field_list, 'comments')), group=PAYLOAD)
     created_at = db.Column(db.DateTime, nullable=not is_mandatory(field_list, 'created_at'), default=datetime.datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=not is_mandatory(field_list, 'updated_at'), default=datetime.datetime.utcnow)
     user = db.relationship("User", back_populates="sequences")
+
+    __table_args__ = (
+        # learner lists (user_id, status filters, created_at order) and User.sequences loads
+        db.Index('ix_sequence_user_id_status_created_at', 'user_id', 'status', 'created_at'),
+        # Challenge.sequences loads
+        db.Index('ix_sequence_challenge_id', 'challenge_id'),
+        # status filter and sort of /api/sequences for administrators
+        db.Index('ix_sequence_status_created_at', 'status', 'created_at'),
+        # created_at sort of /api/sequences, the default one of its cursor pages
+        db.Index('ix_sequence_created_at_id', 'created_at', 'id'),
+        # Last-Modified and ETag of /api/sequences, max(updated_at)
+        db.Index('ix_sequence_updated_at', 'updated_at'),
+    )
     
     def __init__(self, **kwargs):
         self.user_id = kwargs.get('user_id', None)
@@ -72,6 +97,4 @@ class Sequence(db.Model):
         self.not_allow_empty = not_allow_empty_fields(self.field_list)
 
     def as_dict(self, **kwargs):
-        result = model_as_dict(self, **dict(kwargs, special_fields={'status': 'enum'}))
-        result['user'] = model_as_dict(self.user, unloaded_fields=['password', 'role'], special_fields={'role': 'enum'})
-        return result
+        return sequence_nested(self, kwargs.get('unloaded_fields'))
@@ -50,6 +50,15 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, nullable=not is_mandatory(field_list, 'created_at'), default=datetime.datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=not is_mandatory(field_list, 'updated_at'), default=datetime.datetime.utcnow)
     sequences = db.relationship("Sequence", back_populates="user")
+
+    __table_args__ = (
+        # UserGroup.users loads
+        db.Index('ix_user_group_id', 'group_id'),
+        # created_at sort of /api/users, the default one of its cursor pages
+        db.Index('ix_user_created_at_id', 'created_at', 'id'),
+        # Last-Modified and ETag of /api/users, max(updated_at)
+        db.Index('ix_user_updated_at', 'updated_at'),
+    )
    
     def __init__(self, **kwargs):
         self.pseudo = kwargs.get('pseudo', None)
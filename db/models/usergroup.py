@@ -32,6 +32,11 @@ class UserGroup(db.Model):
     challenges = db.relationship("Challenge", backref="usergroup")
     created_at = db.Column(db.DateTime, nullable=not is_mandatory(field_list, 'created_at'))
     updated_at = db.Column(db.DateTime, nullable=not is_mandatory(field_list, 'updated_at'))
+
+    __table_args__ = (
+        # created_at sort of /api/usergroups, the default one of its cursor pages
+        db.Index('ix_user_group_created_at_id', 'created_at', 'id'),
+    )
     
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', None)
@@ -0,0 +1,137 @@
+#!/usr/bin/python
+#coding: utf-8
+
+import json
+import os
+import os.path
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+class StatsQueuePool(QueuePool):
+    # QueuePool keeping track of how long checkouts wait for a connection
+    name = 'primary'
+    stats_dir = None
+
+    def __init__(self, *args, **kwargs):
+        super(StatsQueuePool, self).__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.stats_written_at = 0
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super(StatsQueuePool, self).connect()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+
+    def _do_return_conn(self, conn):
+        super(StatsQueuePool, self)._do_return_conn(conn)
+        write_pool_status(self)
+
+def pool_status(pool):
+    status = {
+        'pid': os.getpid(),
+        'name': getattr(pool, 'name', None),
+        'pool_class': pool.__class__.__name__,
+        'status': pool.status()
+    }
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow
+        })
+    if isinstance(pool, StatsQueuePool):
+        status['wait'] = {
+            'checkouts': pool.checkouts,
+            'timeouts': pool.timeouts,
+            'total_seconds': round(pool.wait_total, 6),
+            'avg_seconds': round(pool.wait_total / pool.checkouts, 6) if pool.checkouts else 0,
+            'max_seconds': round(pool.wait_max, 6)
+        }
+    return status
+
+def write_pool_status(pool, min_interval=1):
+    # each worker dumps its own snapshot so any worker can report all of them
+    if not pool.stats_dir:
+        return
+    now = time.time()
+    if now - pool.stats_written_at < min_interval:
+        return
+    pool.stats_written_at = now
+
+    path = os.path.join(pool.stats_dir, 'pool-' + pool.name + '-' + str(os.getpid()) + '.json')
+    tmp_path = path + '.tmp'
+    try:
+        os.makedirs(pool.stats_dir, exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(dict(pool_status(pool), updated_at=now)))
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+def read_pool_status(stats_dir, name):
+    workers = []
+    if not stats_dir or not os.path.isdir(stats_dir):
+        return workers
+
+    prefix = 'pool-' + name + '-'
+    for filename in sorted(os.listdir(stats_dir)):
+        if not filename.startswith(prefix) or not filename.endswith('.json'):
+            continue
+        pid = int(filename[len(prefix):-len('.json')])
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            # dead worker, forget its snapshot
+            try:
+                os.remove(os.path.join(stats_dir, filename))
+            except OSError:
+                pass
+            continue
+        except PermissionError:
+            pass
+        try:
+            with open(os.path.join(stats_dir, filename), 'r') as f:
+                workers.append(json.loads(f.read()))
+        except (OSError, ValueError):
+            continue
+    return workers
+
+def engine_options(pool_size, max_overflow, pool_timeout, pool_recycle, pre_ping, **kwargs):
+    options = {
+        'poolclass': StatsQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+        'pool_pre_ping': pre_ping
+    }
+
+    # server side timeouts, in milliseconds, sent as libpq startup options
+    server_options = []
+    if kwargs.get('statement_timeout'):
+        server_options.append('-c statement_timeout=' + str(kwargs.get('statement_timeout')))
+    if kwargs.get('idle_in_transaction_session_timeout'):
+        server_options.append('-c idle_in_transaction_session_timeout=' + str(kwargs.get('idle_in_transaction_session_timeout')))
+    if server_options:
+        options['connect_args'] = {'options': ' '.join(server_options)}
+
+    return options
@@ -0,0 +1,104 @@
+#!/usr/bin/python
+#coding: utf-8
+
+import logging
+import re
+import threading
+import time
+
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+class QueryStats(object):
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        # bound parameters are already placeholders, only the layout has to be normalized
+        shape = re.sub(r'\s+', ' ', statement).strip()
+        self.statements[shape] = self.statements.get(shape, 0) + 1
+
+    def n_plus_one(self, threshold=None):
+        if threshold is None:
+            threshold = config.getConfigKey('debug.n_plus_one_threshold', 5)
+        return [(shape, count) for shape, count in self.statements.items() if count >= threshold]
+
+def active_stats():
+    stats = list(getattr(_local, 'collectors', []))
+    if has_app_context() and 'query_stats' in g:
+        stats.append(g.query_stats)
+    return stats
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on the execution context, which goes away with a statement that raises. The few statements run
+    # without one (column defaults pre-executed by the dialect) are counted but not timed
+    if context is not None:
+        context.query_stats_start = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, 'query_stats_start', None)
+    duration = time.perf_counter() - start if start is not None else 0.0
+    for stats in active_stats():
+        stats.record(statement, duration)
+
+@contextmanager
+def count_queries():
+    # collects every statement run by this thread inside the block, requests of the test client included
+    stats = QueryStats()
+    if not hasattr(_local, 'collectors'):
+        _local.collectors = []
+    _local.collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _local.collectors.remove(stats)
+
+def before_request():
+    g.query_stats = QueryStats()
+
+def log_suspects(stats, method, path):
+    suspects = stats.n_plus_one()
+    for shape, count in suspects:
+        logger.warning('N+1 suspect on %s %s: %d x %s', method, path, count, shape)
+    return suspects
+
+def after_request(response):
+    stats = g.get('query_stats')
+    if not stats:
+        return response
+
+    if response.is_streamed:
+        # the body queries run later, while the response is sent: checked once it is closed, and no headers
+        # (they would only count the queries run before the body)
+        method, path = request.method, request.path
+        response.call_on_close(lambda: log_suspects(stats, method, path))
+        return response
+
+    suspects = log_suspects(stats, request.method, request.path)
+
+    if current_app.debug or config.getConfigKey('debug.query_headers', False):
+        response.headers['X-DB-Query-Count'] = str(stats.count)
+        response.headers['X-DB-Query-Time'] = '%.3f' % (stats.duration * 1000)
+        response.headers['X-DB-N-Plus-One'] = str(len(suspects))
+    return response
+
+def init_query_stats(app):
+    app.before_request(before_request)
+    app.after_request(after_request)
+
+    return app
@@ -0,0 +1,52 @@
+#!/usr/bin/python
+#coding: utf-8
+
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+
+from db.pool import StatsQueuePool
+
+REPLICA = 'replica'
+
+class ReplicaStatsQueuePool(StatsQueuePool):
+    name = REPLICA
+
+def use_replica():
+    return has_app_context() and g.get('db_read_only', False) and not g.get('db_written', False)
+
+class RoutingSession(SignallingSession):
+    # send reads of read only requests to the replica, everything else to the primary
+    def __init__(self, db, **options):
+        self.db = db
+        super(RoutingSession, self).__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and use_replica() and REPLICA in (self.app.config.get('SQLALCHEMY_BINDS') or {}):
+            return self.db.get_engine(self.app, bind=REPLICA)
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def stick_to_primary(session, flush_context):
+    # once the request has written, later reads must see that write
+    if has_app_context():
+        g.db_written = True
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        binds = self.get_app().config.get('SQLALCHEMY_BINDS') or {}
+        if REPLICA in binds and str(sa_url) == str(binds[REPLICA]) and engine_opts.get('poolclass') is StatsQueuePool:
+            engine_opts = dict(engine_opts, poolclass=ReplicaStatsQueuePool)
+        return super(RoutingSQLAlchemy, self).create_engine(sa_url, engine_opts)
+
+def read_only(fn):
+    @wraps(fn)
+    def decorator(*args, **kwargs):
+        g.db_read_only = True
+        return fn(*args, **kwargs)
+    return decorator
@@ -3,36 +3,84 @@
 
 import json
 
-from flask import jsonify, request, make_response 
+from flask import make_response 
 from flask_restful import Resource, reqparse
 
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
 
 from utils.jwt import admin_required, jwt_needed, token_identity, token_role, token_group
+from utils.json_provider import jsonify
+from utils.msgpack_provider import request_body
 
 from werkzeug.security import generate_password_hash
 
 from db import conn
-from db.models import Challenge as ChallengeModel
+from db.routing import read_only
+from db.models import Challenge as ChallengeModel, Sequence as SequenceModel, User as UserModel, undefer_payload
 
-from utils.resource import init_reqparser, query_apply_reqparser
+from utils.conditional import freshness, is_fresh, not_modified, add_validators
+from utils.model import as_dict, unloaded_columns
+from utils.resource import init_reqparser, query_apply_reqparser, query_apply_fields, requested_fields, wanted, list_response
 from utils.sanitizers import check_data
 from utils.utils import contains
 
 db = conn.db
 
 model = ChallengeModel()
-parser = init_reqparser()
+
+SORTABLE = {
+    'id': ChallengeModel.id,
+    'title': ChallengeModel.title,
+    'end_date': ChallengeModel.end_date,
+    'created_at': ChallengeModel.created_at,
+    'updated_at': ChallengeModel.updated_at,
+}
+
+parser = init_reqparser(SORTABLE)
 
 def check_user_seq(sequences):
     if sequences:
+        identity = str(token_identity())
         for s in sequences:
-            if str(s['user_id']) == str(token_identity()):
-                return s['id']
+            if str(s.user_id) == identity:
+                return s.id
     return None
 
+def challenge_sources(challenges, fields=None):
+    # rows a challenge body is built from: the challenges, their sequences and the users of the nested sequences
+    sources = [(challenges, ChallengeModel)]
+    if wanted(fields, 'sequences') or wanted(fields, 'user_seq'):
+        sequences = SequenceModel.query.filter(SequenceModel.challenge_id.in_(challenges.with_entities(ChallengeModel.id).subquery()))
+        sources.append((sequences, SequenceModel))
+        if wanted(fields, 'sequences'):
+            sources.append((UserModel.query.filter(UserModel.id.in_(sequences.with_entities(SequenceModel.user_id).subquery())), UserModel))
+    return sources
+
+def query_apply_loading(challenges, fields=None):
+    # a fixed number of queries whatever the size: the sequences of every challenge in one SELECT ... IN,
+    # joined with their user, and their payload only when they are part of the body
+    if wanted(fields, 'sequences'):
+        return challenges.options(
+            selectinload(ChallengeModel.sequences).joinedload(SequenceModel.user),
+            undefer_payload(ChallengeModel.sequences)
+        )
+    if wanted(fields, 'user_seq'):
+        return challenges.options(selectinload(ChallengeModel.sequences))
+    return challenges
+
+def challenge_list(challenge, fields=None):
+    result = as_dict(challenge, unloaded_fields=unloaded_columns(ChallengeModel, fields), special_fields={'end_date': 'date'})
+    if wanted(fields, 'sequences'):
+        result['sequences'] = [s.as_dict(unloaded_fields=['challenge_id']) for s in challenge.sequences]
+    if wanted(fields, 'user_seq'):
+        # read from the rows: the deferred payload is not loaded when only user_seq is wanted
+        result['user_seq'] = check_user_seq(challenge.sequences)
+    return result
+
 class Challenges(Resource):
     @jwt_needed
+    @read_only
     def get(self):
         """
         Lister tous les défis
@@ -47,7 +95,7 @@ class Challenges(Resource):
             - in: query
               name: sort
               type: string
-              description: Examples = sort=end_date (sort by end_date ascending) ; sort=-end_date (sort by end_date descending)
+              description: Comma separated fields among id, title, end_date, created_at, updated_at, ascending (field) or descending (-field), id breaks ties. Examples = sort=end_date (sort by end_date ascending) ; sort=-end_date (sort by end_date descending)
             - in: query
               name: offset
               type: integer
@@ -56,6 +104,23 @@ class Challenges(Resource):
               name: limit
               type: integer
               description: The numbers of items to return
+            - in: query
+              name: cursor
+              type: string
+              description: Cursor pagination, empty for the first page then the `next_cursor` of the previous page (`limit` items per page, sorted by `sort` or by creation date)
+            - in: query
+              name: count
+              type: string
+              enum: [exact, estimated]
+              description: Add the `total` number of items of the list, counted with the page (exact) or read from the planner statistics (estimated, for large lists)
+            - in: query
+              name: stream
+              type: boolean
+              description: Stream the list while rows are read from the database (flat memory on large lists)
+            - in: query
+              name: fields
+              type: string
+              description: Comma separated fields to return (id is always returned), the other columns are not read from the database
         responses:
             200:
                 description: A list of challenges
@@ -75,28 +140,17 @@ class Challenges(Resource):
         if token_role() != 'Administrateur':
             challenges = challenges.filter_by(group_id=token_group())
 
-        challenges = query_apply_reqparser(ChallengeModel, challenges, args)
-        challenges = challenges.all()
+        fields = requested_fields()
+        validator = freshness(*challenge_sources(challenges, fields))
+        if is_fresh(validator):
+            return not_modified(validator)
 
-        output = [] 
+        page = query_apply_reqparser(ChallengeModel, challenges, args)
 
-        for challenge in challenges:
-            sequences = []
-            [sequences.append(s.as_dict(unloaded_fields=['challenge_id'])) for s in challenge.sequences]
-            output.append({ 
-                'id': challenge.id,
-                'title': challenge.title, 
-                'end_date': challenge.end_date.strftime('%Y-%m-%d') if challenge.end_date else None, 
-                'description': challenge.description, 
-                'active': challenge.active,
-                'group_id': challenge.group_id,
-                'sequences': sequences,
-                'created_at': challenge.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'updated_at': challenge.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'user_seq': check_user_seq(sequences)
-            })
+        challenges = query_apply_fields(ChallengeModel, page.query, fields)
+        challenges = query_apply_loading(challenges, fields)
 
-        return make_response(jsonify({'challenges': output}), 200)
+        return add_validators(list_response('challenges', challenges, lambda challenge: challenge_list(challenge, fields), page), validator)
 
     @admin_required
     @jwt_needed
@@ -146,7 +200,7 @@ class Challenges(Resource):
                 description: wrong body content
          """
         
-        data = check_data(model, request.data)
+        data = check_data(model, request_body())
 
         if 'error' in data:
             return make_response(data, 400)
@@ -196,6 +250,10 @@ class Challenge(Resource):
               type: string
               format: uuid
               description: challenge id
+            - in: query
+              name: fields
+              type: string
+              description: Comma separated fields to return (id is always returned), the other columns are not read from the database
         responses:
             200:
                 description: A challenge
@@ -203,7 +261,14 @@ class Challenge(Resource):
                     type: object
                     $ref: '#/definitions/challenge'
         """
-        challenge = model.query.get(id)
+        fields = requested_fields()
+        validator = freshness(*challenge_sources(model.query.filter_by(id=id), fields))
+        if is_fresh(validator):
+            return not_modified(validator)
+
+        challenges = query_apply_fields(ChallengeModel, model.query, fields)
+        challenges = query_apply_loading(challenges, fields)
+        challenge = challenges.get(id)
         
         if not challenge:
             return make_response( 
@@ -211,20 +276,7 @@ class Challenge(Resource):
                 404
             ) 
         else:
-            sequences = []
-            [sequences.append(s.as_dict(unloaded_fields=['challenge_id'])) for s in challenge.sequences]
-            return make_response(jsonify({
-                'id': challenge.id,
-                'title': challenge.title, 
-                'end_date' : challenge.end_date.strftime('%Y-%m-%d') if challenge.end_date else None, 
-                'description': challenge.description, 
-                'active' : challenge.active,
-                'group_id': challenge.group_id,
-                'sequences' : sequences,
-                'user_seq': check_user_seq(sequences),
-                'created_at': challenge.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'updated_at': challenge.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-            }), 200)
+            return add_validators(make_response(jsonify(challenge_list(challenge, fields)), 200), validator)
 
     @admin_required
     @jwt_needed
@@ -286,7 +338,7 @@ class Challenge(Resource):
                 404
             ) 
         else:
-            data = check_data(model, request.data)
+            data = check_data(model, request_body())
 
             if 'error' in data:
                 return make_response(data, 400)
@@ -6,7 +6,7 @@ from conftest import get_fixtures
 
 model = 'challenges'
 
-def test_challenge(client, api_standard_tests):
+def test_challenge(client, api_standard_tests, max_queries):
 
     print('\nPOST /login as admin return 200')
     r = client.post('/api/login', json = {"email":config.getConfigKey('db.admin_email'),"password":config.getConfigKey('db.admin_password')})
@@ -48,6 +48,32 @@ def test_challenge(client, api_standard_tests):
     r = client.get('/api/'+model, headers={"Authorization": "Bearer "+user_token})
     assert r.status_code == 200
     
+    print('\nCreate sequences in test challenge')
+    sequences = []
+    for i in range(3):
+        r = client.post('/api/sequences', json = get_fixtures('sequences', data_param = {"user_id": user, "challenge_id": challenge})['data'], headers={"Authorization": "Bearer "+admin_token})
+        assert r.status_code == 200
+        sequences.append(r.json['id'])
+
+    print('\nGET challenges list and detail run the validator aggregate, the challenges and their sequences with users')
+    with max_queries(3):
+        r = client.get('/api/'+model, headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
+    with max_queries(3):
+        r = client.get('/api/'+model+'/'+challenge, headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
+    assert len(r.json['sequences']) == 3
+    assert all(s['user']['id'] == user for s in r.json['sequences'])
+    with max_queries(3):
+        r = client.get('/api/'+model, headers={"Authorization": "Bearer "+user_token})
+    assert r.status_code == 200
+    for c in r.json['challenges']:
+        if c['id'] == challenge:
+            assert c['user_seq'] in sequences
+
+    for s in sequences:
+        client.delete('/api/sequences/'+s, headers={"Authorization": "Bearer "+admin_token})
+
     print('\nDELETE test challenge with admin token return 200')
     client.delete('/api/'+model+'/'+challenge, headers={"Authorization": "Bearer "+admin_token})
 
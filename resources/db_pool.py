@@ -0,0 +1,54 @@
+#!/usr/bin/python
+#coding: utf-8
+
+from flask import current_app, make_response
+from flask_restful import Resource
+
+from utils.jwt import jwt_needed, admin_required
+from utils.json_provider import jsonify
+
+from db import conn
+from db.pool import StatsQueuePool, pool_status, read_pool_status
+from db.routing import REPLICA, ReplicaStatsQueuePool
+
+db = conn.db
+
+class DbPool(Resource):
+    @admin_required
+    @jwt_needed
+    def get(self):
+        """
+        Etat du pool de connexions à la base de données
+        ---
+        tags:
+            - Paramétrage
+        responses:
+            200:
+                description: Connection pool usage of the worker answering the request and of every worker reporting in db.pool_stats_dir
+                schema:
+                    type: object
+                    properties:
+                        current:
+                            type: object
+                            description: checked out, idle and overflow connections and checkout wait times of this worker
+                        workers:
+                            type: array
+                            description: last snapshot written by each live worker
+                            items:
+                                type: object
+                        replica:
+                            type: object
+                            description: same report for the read replica pool, when db.replica_url is set
+        """
+        output = {
+            'current': pool_status(db.engine.pool),
+            'workers': read_pool_status(StatsQueuePool.stats_dir, StatsQueuePool.name)
+        }
+
+        if REPLICA in (current_app.config.get('SQLALCHEMY_BINDS') or {}):
+            output['replica'] = {
+                'current': pool_status(db.get_engine(current_app, bind=REPLICA).pool),
+                'workers': read_pool_status(StatsQueuePool.stats_dir, ReplicaStatsQueuePool.name)
+            }
+
+        return make_response(jsonify(output), 200)
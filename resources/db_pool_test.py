@@ -0,0 +1,21 @@
+#!/usr/bin/python
+#coding: utf-8
+
+import config
+
+def test_db_pool(client):
+    print('\nGET /admin/db_pool with no auth return 401')
+    assert client.get('/api/admin/db_pool').status_code == 401
+
+    print('\nPOST /login as admin return 200')
+    r = client.post('/api/login', json = {"email":config.getConfigKey('db.admin_email'),"password":config.getConfigKey('db.admin_password')})
+    assert r.status_code == 200
+    admin_token = r.json['access_token']
+
+    print('\nGET /admin/db_pool as admin return 200')
+    r = client.get('/api/admin/db_pool', headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
+    assert 'checked_out' in r.json['current']
+    assert 'idle' in r.json['current']
+    assert 'overflow' in r.json['current']
+    assert 'wait' in r.json['current']
@@ -2,16 +2,16 @@
 #coding: utf-8
 
 import config
-import requests
 import json
 from datetime import datetime, date
 
-from flask import jsonify, request, make_response 
+from flask import request, make_response 
 from flask_restful import Resource
 
 from sqlalchemy.exc import SQLAlchemyError
 
 from utils.jwt import jwt_needed, admin_required
+from utils.json_provider import jsonify
 
 from werkzeug.security import generate_password_hash
 
@@ -22,6 +22,16 @@ db = conn.db
 
 model = FarmbotConfigModel()
 
+_http = None
+
+def http():
+    # requests is imported on the first farmbot api call, the session keeps connections to the api alive
+    global _http
+    if _http is None:
+        import requests
+        _http = requests.Session()
+    return _http
+
 def token_expired():
     fbot_conf = model.query.first()
     if fbot_conf:
@@ -39,7 +49,7 @@ def get_fbot_token():
     # Get your FarmBot Web App token.
     headers = {'content-type': 'application/json'}
     user = {'user': {'email': config.getConfigKey('farmbot-api.email'), 'password': config.getConfigKey('farmbot-api.password')}}
-    response = requests.post(config.getConfigKey('farmbot-api.url')+'/tokens',
+    response = http().post(config.getConfigKey('farmbot-api.url')+'/tokens',
                              headers=headers, json=user)
 
     response = response.json()    
@@ -76,7 +86,7 @@ def getPin(token, pType, pin_id):
         'Authorization': 'Bearer ' + token
     }
     try:
-        response = requests.get(config.getConfigKey('farmbot-api.url')+'/'+str.lower(pType)+'s',
+        response = http().get(config.getConfigKey('farmbot-api.url')+'/'+str.lower(pType)+'s',
                                 headers=headers)
     except Exception as e:
         return { "error" : 'config key '+str(e)+' not exists'}
@@ -96,10 +106,10 @@ def create_or_update_sequence(token, data, fb_seq_id):
     }
     try:
         if fb_seq_id:
-            response = requests.put(config.getConfigKey('farmbot-api.url')+'/sequences/'+str(fb_seq_id),
+            response = http().put(config.getConfigKey('farmbot-api.url')+'/sequences/'+str(fb_seq_id),
                                 headers=headers, json=data)
         else:
-            response = requests.post(config.getConfigKey('farmbot-api.url')+'/sequences',
+            response = http().post(config.getConfigKey('farmbot-api.url')+'/sequences',
                                 headers=headers, json=data)
     except Exception as e:
         return {
@@ -117,7 +127,7 @@ def delete_sequence(token, fb_seq_id):
     }
     try:
         if fb_seq_id:
-            response = requests.delete(config.getConfigKey('farmbot-api.url')+'/sequences/'+str(fb_seq_id),
+            response = http().delete(config.getConfigKey('farmbot-api.url')+'/sequences/'+str(fb_seq_id),
                                 headers=headers)
         else:
             return make_response(jsonify({
@@ -0,0 +1,66 @@
+#!/usr/bin/python
+#coding: utf-8
+
+import uuid
+
+from sqlalchemy import func
+
+from db import conn
+from db.explain import explain, plan_indexes
+from db.models import Sequence as SequenceModel, Challenge as ChallengeModel, User as UserModel, UserGroup as UserGroupModel
+from db.models.sequence import SequenceStatus
+
+db = conn.db
+
+def indexes_used(query):
+    # test tables hold a few rows, a sequential scan would always win: disabled, the plan shows whether an index can serve the query
+    db.session.execute('SET LOCAL enable_seqscan = off')
+    try:
+        return plan_indexes(explain(query))
+    finally:
+        db.session.rollback()
+
+def test_index(app):
+    with app.app_context():
+        print('\nIndexes declared by the models exist (flask db upgrade)')
+        declared = set(i.name for m in [SequenceModel, ChallengeModel, UserModel, UserGroupModel] for i in m.__table__.indexes)
+        existing = set(r[0] for r in db.session.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()"))
+        assert declared <= existing
+
+        user = uuid.uuid4()
+        group = uuid.uuid4()
+
+        print('\nSequences of a learner by status')
+        assert 'ix_sequence_user_id_status_created_at' in indexes_used(
+            SequenceModel.query.filter(SequenceModel.user_id == user, SequenceModel.status == SequenceStatus.WIP).order_by(SequenceModel.created_at)
+        )
+
+        print('\nSequences of challenges (Challenge.sequences loads)')
+        assert 'ix_sequence_challenge_id' in indexes_used(
+            SequenceModel.query.filter(SequenceModel.challenge_id.in_([uuid.uuid4(), uuid.uuid4()]))
+        )
+
+        print('\nSequences by status')
+        assert 'ix_sequence_status_created_at' in indexes_used(
+            SequenceModel.query.filter(SequenceModel.status == SequenceStatus.TO_PROCESS).order_by(SequenceModel.created_at)
+        )
+
+        print('\nCursor pages of sequences, challenges and users')
+        assert 'ix_sequence_created_at_id' in indexes_used(
+            SequenceModel.query.order_by(SequenceModel.created_at, SequenceModel.id).limit(50)
+        )
+        assert 'ix_challenge_end_date_id' in indexes_used(
+            ChallengeModel.query.order_by(ChallengeModel.end_date.desc(), ChallengeModel.id.desc()).limit(50)
+        )
+        assert 'ix_user_created_at_id' in indexes_used(
+            UserModel.query.order_by(UserModel.created_at, UserModel.id).limit(50)
+        )
+
+        print('\nLast update of the sequences (conditional requests)')
+        assert 'ix_sequence_updated_at' in indexes_used(db.session.query(func.max(SequenceModel.updated_at)))
+
+        print('\nChallenges and users of a group')
+        assert 'ix_challenge_group_id_created_at' in indexes_used(
+            ChallengeModel.query.filter(ChallengeModel.group_id == group).order_by(ChallengeModel.created_at)
+        )
+        assert 'ix_user_group_id' in indexes_used(UserModel.query.filter(UserModel.group_id == group))
@@ -4,7 +4,7 @@
 import json
 import config
 
-from flask import request, jsonify, make_response 
+from flask import make_response 
 from flask_restful import Resource
 from flask_jwt_extended import create_access_token
 
@@ -14,6 +14,10 @@ from datetime import datetime, timedelta
 
 from db.models import User
 
+from utils.json_provider import jsonify
+from utils.msgpack_provider import request_body
+from utils.sanitizers import load_data
+
 class Login(Resource):
     def post(self):
         """
@@ -53,7 +57,7 @@ class Login(Resource):
         """
 
         # creates a dictionary of the form data 
-        auth = json.loads(request.data) 
+        auth = load_data(request_body()) 
     
         if not auth or not auth['email'] or not auth['password']: 
             # returns 401 if any email or / and password is missing 
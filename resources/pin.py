@@ -3,19 +3,23 @@
 
 import json
 
-from flask import jsonify, request, make_response 
+from flask import make_response 
 from flask_restful import Resource, reqparse
 
 from sqlalchemy import or_
 from sqlalchemy.exc import SQLAlchemyError
 
 from utils.jwt import admin_required, jwt_needed, token_identity
+from utils.json_provider import jsonify
+from utils.msgpack_provider import request_body
 
 from werkzeug.security import generate_password_hash
 
 from db import conn
+from db.routing import read_only
 from db.models import Pin as PinModel, MaterialTypes
 
+from utils.conditional import freshness, is_fresh, not_modified, add_validators
 from utils.resource import init_reqparser, query_apply_reqparser
 from utils.sanitizers import check_data
 from utils.utils import contains
@@ -37,6 +41,7 @@ def getPinByAction(action):
 
 class Pins(Resource):
     @jwt_needed
+    @read_only
     def get(self):
         """
         Lister les actions liées à des pins
@@ -51,6 +56,11 @@ class Pins(Resource):
                     $ref: '#/definitions/pin'
         """
         pins = model.query
+
+        validator = freshness((pins, PinModel))
+        if is_fresh(validator):
+            return not_modified(validator)
+
         pins = pins.all()
 
         output = [] 
@@ -68,7 +78,7 @@ class Pins(Resource):
                 'updated_at': pin.updated_at.strftime('%Y-%m-%d %H:%M:%S')
             })
 
-        return make_response(jsonify({'pins': output}), 200)
+        return add_validators(make_response(jsonify({'pins': output}), 200), validator)
 
     @admin_required
     @jwt_needed
@@ -111,7 +121,7 @@ class Pins(Resource):
                 description: wrong body content
          """
         
-        data = check_data(model, request.data, enum=['material_type', MaterialTypes])
+        data = check_data(model, request_body(), enum=['material_type', MaterialTypes])
 
         if 'error' in data:
             return make_response(data, 400)
@@ -173,6 +183,10 @@ class Pin(Resource):
                     type: object
                     $ref: '#/definitions/pin'
         """
+        validator = freshness((model.query.filter_by(id=id), PinModel))
+        if is_fresh(validator):
+            return not_modified(validator)
+
         pin = model.query.get(id)
         
         if not pin:
@@ -181,7 +195,7 @@ class Pin(Resource):
                 404
             ) 
         else:
-            return make_response(jsonify({
+            return add_validators(make_response(jsonify({
                 'id': pin.id,
                 'material_type': {
                     "code": pin.material_type.name,
@@ -191,7 +205,7 @@ class Pin(Resource):
                 'action': pin.action,
                 'created_at': pin.created_at.strftime('%Y-%m-%d %H:%M:%S'),
                 'updated_at': pin.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-            }), 200)
+            }), 200), validator)
 
     @admin_required
     @jwt_needed
@@ -245,7 +259,7 @@ class Pin(Resource):
                 404
             ) 
         else:
-            data = check_data(model, request.data)
+            data = check_data(model, request_body())
 
             if 'error' in data:
                 return make_response(data, 400)
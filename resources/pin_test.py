@@ -5,8 +5,16 @@ import config
 
 model = 'pins'
 
-def test_pins(client, api_standard_tests):
+def test_pins(client, api_standard_tests, max_queries):
     assert api_standard_tests(
         client = client, 
         model = model
     )
+
+    r = client.post('/api/login', json = {"email":config.getConfigKey('db.admin_email'),"password":config.getConfigKey('db.admin_password')})
+    admin_token = r.json['access_token']
+
+    print('\nGET pins list runs the validator aggregate and a single list query')
+    with max_queries(2):
+        r = client.get('/api/'+model, headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
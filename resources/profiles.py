@@ -0,0 +1,94 @@
+#!/usr/bin/python
+#coding: utf-8
+
+import io
+import pstats
+
+from flask import make_response, request, send_file
+from flask_restful import Resource
+
+from utils.jwt import jwt_needed, admin_required
+from utils.profiling import list_profiles, profile_path
+from utils.json_provider import jsonify
+
+class Profiles(Resource):
+    @admin_required
+    @jwt_needed
+    def get(self):
+        """
+        Liste des requêtes profilées les plus lentes
+        ---
+        tags:
+            - Paramétrage
+        responses:
+            200:
+                description: Slowest requests profiled with the `X-Profile` header, slowest first
+                schema:
+                    type: object
+                    properties:
+                        profiles:
+                            type: array
+                            items:
+                                type: object
+                                properties:
+                                    id:
+                                        type: string
+                                    method:
+                                        type: string
+                                    path:
+                                        type: string
+                                    status:
+                                        type: integer
+                                    duration_ms:
+                                        type: number
+                                    split_ms:
+                                        type: object
+                                        description: time spent in sql, serialization, farmbot and other
+                                    queries:
+                                        type: integer
+                                    created_at:
+                                        type: string
+        """
+        return make_response(jsonify({'profiles': list_profiles()}), 200)
+
+class Profile(Resource):
+    @admin_required
+    @jwt_needed
+    def get(self, id):
+        """
+        Télécharger un profil
+        ---
+        tags:
+            - Paramétrage
+        parameters:
+            - in: path
+              name: id
+              type: string
+              required: true
+            - in: query
+              name: format
+              type: string
+              description: "`prof` (default) for a cProfile dump (snakeviz, pstats...), `text` for the call tree sorted by cumulative time"
+        responses:
+            200:
+                description: the profile
+            404:
+                description: profile not found
+        """
+        path = profile_path(id)
+        if not path:
+            return make_response(
+                'Profile not found',
+                404
+            )
+
+        if request.args.get('format') == 'text':
+            output = io.StringIO()
+            stats = pstats.Stats(path, stream=output)
+            stats.sort_stats('cumulative').print_stats(60)
+            stats.print_callees(30)
+            response = make_response(output.getvalue(), 200)
+            response.mimetype = 'text/plain'
+            return response
+
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True, attachment_filename=id + '.prof')
@@ -0,0 +1,52 @@
+#!/usr/bin/python
+#coding: utf-8
+
+import config
+from conftest import get_fixtures
+
+def test_profiles(client):
+    print('\nGET /admin/profiles with no auth return 401')
+    assert client.get('/api/admin/profiles').status_code == 401
+
+    print('\nPOST /login as admin return 200')
+    r = client.post('/api/login', json = {"email":config.getConfigKey('db.admin_email'),"password":config.getConfigKey('db.admin_password')})
+    assert r.status_code == 200
+    admin_token = r.json['access_token']
+
+    print('\nGET /pins profiled as admin return 200 with a profile id')
+    r = client.get('/api/pins', headers={"Authorization": "Bearer "+admin_token, "X-Profile": "1"})
+    assert r.status_code == 200
+    assert 'sql;dur=' in r.headers['Server-Timing']
+    profile_id = r.headers['X-Profile-Id']
+
+    print('\nGET /sequences profiled as admin reports the serialization time')
+    usergroup_data = get_fixtures('usergroups')['data']
+    usergroup_data['generate_learners'] = 0
+    usergroup = client.post('/api/usergroups', json = usergroup_data, headers={"Authorization": "Bearer "+admin_token}).json['id']
+    user = client.post('/api/users', json = get_fixtures('users', data_param = {"group_id": usergroup})['data'], headers={"Authorization": "Bearer "+admin_token}).json['id']
+    challenge = client.post('/api/challenges', json = get_fixtures('challenges', data_param = {"group_id": usergroup})['data'], headers={"Authorization": "Bearer "+admin_token}).json['id']
+    r = client.post('/api/sequences', json = get_fixtures('sequences', data_param = {"user_id": user, "challenge_id": challenge})['data'], headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
+    sequence = r.json['id']
+    # streamed bodies are serialized once the profiler is stopped
+    r = client.get('/api/sequences?stream=false', headers={"Authorization": "Bearer "+admin_token, "X-Profile": "1"})
+    assert r.status_code == 200
+    timing = dict(t.strip().split(';dur=') for t in r.headers['Server-Timing'].split(','))
+    assert float(timing['serialization']) > 0
+    client.delete('/api/sequences/'+sequence, headers={"Authorization": "Bearer "+admin_token})
+    client.delete('/api/challenges/'+challenge, headers={"Authorization": "Bearer "+admin_token})
+    client.delete('/api/users/'+user, headers={"Authorization": "Bearer "+admin_token})
+    client.delete('/api/usergroups/'+usergroup, headers={"Authorization": "Bearer "+admin_token})
+
+    print('\nGET /admin/profiles as admin return 200')
+    r = client.get('/api/admin/profiles', headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
+    assert profile_id in [p['id'] for p in r.json['profiles']]
+
+    print('\nGET /admin/profiles/<id> as admin return 200')
+    r = client.get('/api/admin/profiles/'+profile_id+'?format=text', headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
+
+    print('\nGET /admin/profiles/<id> unknown return 404')
+    r = client.get('/api/admin/profiles/unknown', headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 404
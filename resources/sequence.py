@@ -3,30 +3,44 @@
 
 import json
 
-from flask import jsonify, request, make_response 
+from flask import make_response 
 from flask_restful import Resource
 
 from sqlalchemy.exc import SQLAlchemyError
 
 from utils.jwt import jwt_needed, admin_required, token_identity, token_pseudo, token_role
+from utils.json_provider import jsonify
+from utils.msgpack_provider import request_body
 
 from db import conn
-from db.models import Sequence as SequenceModel
+from db.routing import read_only
+from db.models import Sequence as SequenceModel, User as UserModel, Challenge as ChallengeModel, undefer_payload
 
 from resources.fbot_conf import get_fbot_token, create_or_update_sequence, delete_sequence
 
-from utils.resource import init_reqparser, query_apply_reqparser
-from utils.sanitizers import check_data
+from utils.resource import init_reqparser, query_apply_reqparser, query_apply_fields, requested_fields, list_response
+from utils.sanitizers import check_data, changes_dt, load_data
 from utils.utils import contains
 from utils.celery import sequence_action_to_celery
+from utils.conditional import freshness, is_fresh, not_modified, add_validators
+from utils.serializers import sequence_list, sequence_detail, sequence_status
 
 db = conn.db
 
 model = SequenceModel()
-parser = init_reqparser()
+
+SORTABLE = {
+    'id': SequenceModel.id,
+    'status': SequenceModel.status,
+    'created_at': SequenceModel.created_at,
+    'updated_at': SequenceModel.updated_at,
+}
+
+parser = init_reqparser(SORTABLE)
 
 class Sequences(Resource):
     @jwt_needed
+    @read_only
     def get(self):
         """
         Lister toutes les séquences
@@ -42,7 +56,7 @@ class Sequences(Resource):
             - in: query
               name: sort
               type: string
-              description: Examples = sort=end_date (sort by end_date ascending) ; sort=-end_date (sort by end_date descending)
+              description: Comma separated fields among id, status, created_at, updated_at, ascending (field) or descending (-field), id breaks ties. Examples = sort=status,-updated_at (by status, then most recently updated first)
             - in: query
               name: offset
               type: integer
@@ -51,6 +65,23 @@ class Sequences(Resource):
               name: limit
               type: integer
               description: The numbers of items to return
+            - in: query
+              name: cursor
+              type: string
+              description: Cursor pagination, empty for the first page then the `next_cursor` of the previous page (`limit` items per page, sorted by `sort` or by creation date)
+            - in: query
+              name: count
+              type: string
+              enum: [exact, estimated]
+              description: Add the `total` number of items of the list, counted with the page (exact) or read from the planner statistics (estimated, for large lists)
+            - in: query
+              name: stream
+              type: boolean
+              description: Stream the list while rows are read from the database (flat memory on large lists)
+            - in: query
+              name: fields
+              type: string
+              description: Comma separated fields to return (id is always returned), the other columns are not read from the database
         responses:
             200:
                 description: A list of sequences
@@ -68,28 +99,19 @@ class Sequences(Resource):
         
         if token_role() != 'Administrateur':
             sequences = sequences.filter(SequenceModel.user_id == token_identity())
+
+        validator = freshness((sequences, SequenceModel))
+        if is_fresh(validator):
+            return not_modified(validator)
          
-        sequences = query_apply_reqparser(SequenceModel, sequences, args)
-        sequences = sequences.all()
-
-        output = [] 
-        for sequence in sequences:
-            output.append({ 
-                'id': sequence.id,
-                'user_id': sequence.user_id, 
-                'challenge_id' : sequence.challenge_id, 
-                'status' : {
-                    "code": sequence.status.name,
-                    "label": sequence.status.value
-                },
-                "actions": sequence.actions,
-                "fb_seq_id": sequence.fb_seq_id,
-                "comments": sequence.comments,
-                'created_at': sequence.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'updated_at': sequence.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-            }) 
+        page = query_apply_reqparser(SequenceModel, sequences, args)
+
+        fields = requested_fields()
+        sequences = query_apply_fields(SequenceModel, page.query, fields)
+        if fields is None:
+            sequences = sequences.options(undefer_payload())
 
-        return make_response(jsonify({'sequences': output}), 200)
+        return add_validators(list_response('sequences', sequences, lambda sequence: sequence_list(sequence, fields), page), validator)
 
     @jwt_needed
     def post(self):
@@ -137,7 +159,7 @@ class Sequences(Resource):
             400:
                 description: wrong body content
         """
-        data = check_data(model, request.data, force_default={'status':'WIP'}, force_if_missing={'user_id': token_identity()})
+        data = check_data(model, request_body(), force_default={'status':'WIP'}, force_if_missing={'user_id': token_identity()})
 
         if 'error' in data:
             return make_response(data, 400)
@@ -156,20 +178,7 @@ class Sequences(Resource):
                 }
             }), 400)
         else:
-            return make_response(jsonify({
-                'id': sequence.id,
-                'user_id': sequence.user_id, 
-                'challenge_id' : sequence.challenge_id, 
-                'status' : {
-                    "code": sequence.status.name,
-                    "label": sequence.status.value
-                },
-                "actions": sequence.actions,
-                "fb_seq_id": sequence.fb_seq_id,
-                "comments": sequence.comments,
-                'created_at': sequence.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'updated_at': sequence.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-            }), 200)
+            return make_response(jsonify(sequence_list(sequence)), 200)
 
 class Sequence(Resource):  
     @jwt_needed
@@ -186,6 +195,10 @@ class Sequence(Resource):
               type: string
               format: uuid
               description: sequence id
+            - in: query
+              name: fields
+              type: string
+              description: Comma separated fields to return (id is always returned), the other columns are not read from the database
         responses:
             200:
                 description: A sequence
@@ -195,7 +208,22 @@ class Sequence(Resource):
             404:
                 description: sequence id not found
         """
-        sequence = model.query.get(id)
+        owned = model.query.filter_by(id=id)
+        if str(token_role()) != 'Administrateur':
+            owned = owned.filter(SequenceModel.user_id == token_identity())
+        validator = freshness(
+            (owned, SequenceModel),
+            (UserModel.query.filter(UserModel.id.in_(owned.with_entities(SequenceModel.user_id).subquery())), UserModel),
+            (ChallengeModel.query.filter(ChallengeModel.id.in_(owned.with_entities(SequenceModel.challenge_id).subquery())), ChallengeModel)
+        )
+        if is_fresh(validator):
+            return not_modified(validator)
+
+        fields = requested_fields()
+        sequences = query_apply_fields(SequenceModel, model.query, fields, needed=('user_id', 'challenge_id'))
+        if fields is None:
+            sequences = sequences.options(undefer_payload())
+        sequence = sequences.get(id)
         
         if (not sequence) or (str(token_role()) != 'Administrateur' and str(sequence.user_id) != str(token_identity())):
             return make_response( 
@@ -203,21 +231,7 @@ class Sequence(Resource):
                 404
             ) 
         else:
-            return make_response(jsonify({
-                'id': sequence.id,
-                'user_id': sequence.user_id,
-                'user': sequence.user.as_dict(),
-                'challenge' : sequence.challenge.as_dict(), 
-                'status' : {
-                    "code": sequence.status.name,
-                    "label": sequence.status.value
-                },
-                "actions": sequence.actions,
-                "fb_seq_id": sequence.fb_seq_id,
-                "comments": sequence.comments,
-                'created_at': sequence.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'updated_at': sequence.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-           }), 200)
+            return add_validators(make_response(jsonify(sequence_detail(sequence, fields)), 200), validator)
     
     @jwt_needed
     def put(self, id):
@@ -279,7 +293,7 @@ class Sequence(Resource):
             404:
                 description: sequence id not found
         """
-        sequence = model.query.get(id)
+        sequence = model.query.options(undefer_payload()).get(id)
         
         if (not sequence) or (str(token_role()) != 'Administrateur' and str(sequence.user_id) != str(token_identity())):
             return make_response( 
@@ -289,7 +303,7 @@ class Sequence(Resource):
         else:
             data = check_data(
                 model, 
-                request.data, 
+                request_body(), 
                 force_default={'status':sequence.status}, 
                 force_if_missing={
                     'user_id':sequence.user_id,
@@ -318,20 +332,7 @@ class Sequence(Resource):
                     }
                 }), 400)
             else:
-                return make_response(jsonify({
-                    'id': sequence.id,
-                    'user_id': sequence.user_id, 
-                    'challenge_id' : sequence.challenge_id, 
-                    'status' : {
-                        "code": sequence.status.name,
-                        "label": sequence.status.value
-                    },
-                    "actions": sequence.actions,
-                    "fb_seq_id": sequence.fb_seq_id,
-                    "comments": sequence.comments,
-                    'created_at': sequence.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'updated_at': sequence.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-                }), 200)
+                return make_response(jsonify(sequence_list(sequence)), 200)
 
     @admin_required
     @jwt_needed
@@ -389,7 +390,7 @@ class Sequence(Resource):
                 )
 
 def UpdateStatus(id, status, data, **kwargs):
-    sequence = model.query.get(id)
+    sequence = model.query.options(undefer_payload()).get(id)
     
     if (not sequence) or (str(token_role()) != 'Administrateur' and str(sequence.user_id) != str(token_identity())):
         return make_response( 
@@ -399,7 +400,7 @@ def UpdateStatus(id, status, data, **kwargs):
     else:
         data = check_data(
             model, 
-            request.data, 
+            request_body(), 
             force_if_missing={
                 'user_id':sequence.user_id,
                 'challenge_id':sequence.challenge_id,
@@ -425,21 +426,7 @@ def UpdateStatus(id, status, data, **kwargs):
                 }
             }), 400)
         else:
-            return make_response(jsonify({
-                'id': sequence.id,
-                'user_id': sequence.user_id, 
-                'challenge_id' : sequence.challenge_id, 
-                'status' : {
-                    "code": sequence.status.name,
-                    "label": sequence.status.value
-                },
-                "actions": sequence.actions,
-                "fb_seq_id": sequence.fb_seq_id,
-                "comments": sequence.comments,
-                'created_at': sequence.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'updated_at': sequence.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-                "celery": kwargs.get('celery') if kwargs.get('celery') else None
-            }), 200)
+            return make_response(jsonify(sequence_status(sequence, kwargs.get('celery'))), 200)
 
 class Send_To_Wip(Resource):
     @jwt_needed
@@ -502,7 +489,7 @@ class Send_To_Wip(Resource):
             404:
                 description: sequence id not found
         """
-        return UpdateStatus(id, 'WIP', request.data)
+        return UpdateStatus(id, 'WIP', request_body())
 
 class Send_To_Process(Resource):
     @jwt_needed
@@ -565,7 +552,7 @@ class Send_To_Process(Resource):
             404:
                 description: sequence id not found
         """
-        return UpdateStatus(id, 'TO_PROCESS', request.data)
+        return UpdateStatus(id, 'TO_PROCESS', request_body())
 
 class Send_To_Process_Wip(Resource):
     @jwt_needed
@@ -634,7 +621,7 @@ class Send_To_Process_Wip(Resource):
             return fbot_token
         
         try:
-            sequence = model.query.get(id)
+            sequence = model.query.options(undefer_payload()).get(id)
         except SQLAlchemyError as e:
             return make_response(jsonify({
                 "message": "unable to get sequence",
@@ -643,7 +630,7 @@ class Send_To_Process_Wip(Resource):
         
         data = check_data(
             model, 
-            request.data, 
+            request_body(), 
             force_if_missing={
                 'user_id':sequence.user_id,
                 'challenge_id':sequence.challenge_id,
@@ -666,7 +653,7 @@ class Send_To_Process_Wip(Resource):
                 "error": fb_seq
             }), 400)
 
-        return UpdateStatus(id, 'PROCESS_WIP', request.data, celery=celery_script, seq_id=fb_seq['id'])
+        return UpdateStatus(id, 'PROCESS_WIP', request_body(), celery=celery_script, seq_id=fb_seq['id'])
 
 class Send_Processed(Resource):
     @jwt_needed
@@ -729,7 +716,7 @@ class Send_Processed(Resource):
             404:
                 description: sequence id not found
         """
-        return UpdateStatus(id, 'PROCESSED', request.data)
+        return UpdateStatus(id, 'PROCESSED', request_body())
 
 class Comments(Resource):
     @jwt_needed
@@ -766,7 +753,7 @@ class Comments(Resource):
                 description: sequence id not found
         """
         try:
-            sequence = model.query.get(id)
+            sequence = model.query.options(undefer_payload()).get(id)
         except SQLAlchemyError as e:
             return make_response(jsonify({
                 "message": "unable to get sequence",
@@ -776,7 +763,7 @@ class Comments(Resource):
         user_id = str(token_identity())
         user_pseudo = str(token_pseudo())
 
-        data = json.loads(request.data)
+        data = load_data(request_body())
 
         if 'comment' in data:
             comment = {
@@ -797,6 +784,7 @@ class Comments(Resource):
         comments.append(comment)
 
         sequence.comments = comments
+        sequence.updated_at = changes_dt()
         
         try:
             db.session.commit()
@@ -1,13 +1,15 @@
 #!/usr/bin/python
 #coding: utf-8
 
+import base64
 import config
 import json
+import msgpack
 from conftest import get_fixtures
 
 model = 'sequences'
 
-def test_sequence(client, api_standard_tests):
+def test_sequence(client, api_standard_tests, max_queries):
 
     print('\nPOST /login as admin return 200')
     r = client.post('/api/login', json = {"email":config.getConfigKey('db.admin_email'),"password":config.getConfigKey('db.admin_password')})
@@ -129,6 +131,99 @@ def test_sequence(client, api_standard_tests):
     assert r.status_code == 200
     assert r.json['status']['code'] == 'WIP'
 
+    print('\nStreamed sequences list is the same as the regular one')
+    r = client.get('/api/sequences?sort=id', headers={"Authorization": "Bearer "+admin_token})
+    streamed = client.get('/api/sequences?sort=id&stream=true', headers={"Authorization": "Bearer "+admin_token})
+    assert streamed.status_code == 200
+    assert streamed.is_streamed
+    assert streamed.data == r.data
+
+    print('\nSequences cursor pages cover the list once')
+    r = client.get('/api/sequences', headers={"Authorization": "Bearer "+admin_token})
+    expected = [s['id'] for s in r.json['sequences']]
+    seen = []
+    cursor = ''
+    while cursor is not None:
+        r = client.get('/api/sequences?limit=2&cursor='+cursor, headers={"Authorization": "Bearer "+admin_token})
+        assert r.status_code == 200
+        assert len(r.json['sequences']) <= 2
+        seen += [s['id'] for s in r.json['sequences']]
+        cursor = r.json['next_cursor']
+    assert len(seen) == len(set(seen))
+    assert sorted(seen) == sorted(expected)
+    r = client.get('/api/sequences?limit=2&cursor=', headers={"Authorization": "Bearer "+admin_token})
+    streamed = client.get('/api/sequences?limit=2&cursor=&stream=true', headers={"Authorization": "Bearer "+admin_token})
+    assert json.loads(streamed.data) == r.json
+    r = client.get('/api/sequences?cursor=not_a_cursor', headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 400
+
+    print('\nSequences cursor with values that do not fit their columns return 400')
+    for values in [['not_a_date', '8c6b1b4e-0f3a-4d38-9a3f-2f0c4d1e5b6a'], ['2021-01-01T00:00:00', 'not_a_uuid'], [1, 2]]:
+        tampered = base64.urlsafe_b64encode(json.dumps(['created_at,id', values]).encode('utf-8')).decode('ascii').rstrip('=')
+        r = client.get('/api/sequences?cursor='+tampered, headers={"Authorization": "Bearer "+admin_token})
+        assert r.status_code == 400
+    tampered = base64.urlsafe_b64encode(json.dumps(['status,id', ['NOT_A_STATUS', '8c6b1b4e-0f3a-4d38-9a3f-2f0c4d1e5b6a']]).encode('utf-8')).decode('ascii').rstrip('=')
+    r = client.get('/api/sequences?sort=status&cursor='+tampered, headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 400
+
+    print('\nSequences cursor pages with a multi-column sort follow the order of the list')
+    r = client.get('/api/sequences?sort=status,-updated_at', headers={"Authorization": "Bearer "+admin_token})
+    expected = [s['id'] for s in r.json['sequences']]
+    seen = []
+    cursor = ''
+    while cursor is not None:
+        r = client.get('/api/sequences?sort=status,-updated_at&limit=2&cursor='+cursor, headers={"Authorization": "Bearer "+admin_token})
+        assert r.status_code == 200
+        seen += [s['id'] for s in r.json['sequences']]
+        cursor = r.json['next_cursor']
+    assert seen == expected
+
+    print('\nSequences sorted on an unsupported key return 400 before any query')
+    for sort in ['actions', 'user', 'status,status']:
+        with max_queries(0):
+            r = client.get('/api/sequences?sort='+sort, headers={"Authorization": "Bearer "+admin_token})
+        assert r.status_code == 400
+        assert 'sort' in r.json['message']
+
+    print('\nSequences list and detail with a sparse fieldset')
+    r = client.get('/api/sequences?fields=status,updated_at', headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
+    for s in r.json['sequences']:
+        assert sorted(s.keys()) == ['id', 'status', 'updated_at']
+    r = client.get('/api/sequences/'+sequence+'?fields=status,user', headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
+    assert sorted(r.json.keys()) == ['id', 'status', 'user']
+
+    print('\nSequence update and detail in msgpack')
+    r = client.put(
+        '/api/sequences/'+sequence,
+        data = msgpack.packb(sequences_fixtures['data']),
+        content_type = 'application/msgpack',
+        headers={"Authorization": "Bearer "+admin_token}
+    )
+    assert r.status_code == 200
+    r = client.get('/api/sequences/'+sequence, headers={"Authorization": "Bearer "+admin_token, "Accept": "application/msgpack"})
+    assert r.status_code == 200
+    assert r.mimetype == 'application/msgpack'
+    assert msgpack.unpackb(r.data)['id'] == sequence
+
+    print('\nInvalid msgpack bodies return 400')
+    for body in [b'\xc1', msgpack.packb([1, 2])]:
+        r = client.post('/api/sequences/'+sequence+'/comments', data = body, content_type = 'application/msgpack', headers={"Authorization": "Bearer "+admin_token})
+        assert r.status_code == 400
+        assert 'msgpack' in r.json['error']['message']
+
+    print('\nUnchanged sequence and challenges answer 304')
+    r = client.get('/api/sequences/'+sequence, headers={"Authorization": "Bearer "+user_token})
+    assert r.status_code == 200
+    sequence_etag = r.headers['ETag']
+    r = client.get('/api/sequences/'+sequence, headers={"Authorization": "Bearer "+user_token, "If-None-Match": sequence_etag})
+    assert r.status_code == 304
+    assert r.data == b''
+    r = client.get('/api/challenges', headers={"Authorization": "Bearer "+user_token})
+    r = client.get('/api/challenges', headers={"Authorization": "Bearer "+user_token, "If-None-Match": r.headers['ETag']})
+    assert r.status_code == 304
+
     print('\nCheck user sequence id in challenge')
     r = client.get('/api/challenges/'+challenge, headers={"Authorization": "Bearer "+user_token})
     assert r.status_code == 200
@@ -149,6 +244,11 @@ def test_sequence(client, api_standard_tests):
     print('\nAdd second comment to sequence ', sequence)
     assert r.status_code == 200
 
+    print('\nCommented sequence is modified')
+    r = client.get('/api/sequences/'+sequence, headers={"Authorization": "Bearer "+user_token, "If-None-Match": sequence_etag})
+    assert r.status_code == 200
+    assert r.headers['ETag'] != sequence_etag
+
     client.delete('/api/sequences/'+sequence, headers={"Authorization": "Bearer "+admin_token})
     
     r = client.post('/api/sequences', json = sequences_fixtures['data'], headers={"Authorization": "Bearer "+user_token})
@@ -4,7 +4,7 @@
 import json
 import config
 
-from flask import request, jsonify, make_response 
+from flask import make_response 
 from flask_restful import Resource
 
 from sqlalchemy.exc import SQLAlchemyError
@@ -15,6 +15,8 @@ from db import conn
 from db.models import User, UserRoles
 
 from utils.sanitizers import check_data
+from utils.json_provider import jsonify
+from utils.msgpack_provider import request_body
 
 db = conn.db
 
@@ -67,7 +69,7 @@ class Signup(Resource):
         """
 
         # creates a dictionary of the form data 
-        data = check_data(User(), request.data)
+        data = check_data(User(), request_body())
 
         if 'error' in data:
             return make_response(data, 400)
@@ -3,26 +3,40 @@
 
 import json
 
-from flask import jsonify, request, make_response 
+from flask import make_response 
 from flask_restful import Resource
 
 from sqlalchemy.exc import SQLAlchemyError
 
 from utils.jwt import jwt_needed, admin_required
+from utils.json_provider import jsonify
+from utils.msgpack_provider import request_body
 
 from werkzeug.security import generate_password_hash
 
 from db import conn
-from db.models import User as UserModel
+from db.routing import read_only
+from db.models import User as UserModel, Sequence as SequenceModel, undefer_payload
 
-from utils.resource import init_reqparser, query_apply_reqparser
+from utils.conditional import freshness, is_fresh, not_modified, add_validators
+from utils.model import as_dict, unloaded_columns
+from utils.resource import init_reqparser, query_apply_reqparser, query_apply_fields, requested_fields, wanted, list_response
 from utils.sanitizers import check_data
 from utils.utils import contains
 
 db = conn.db
 
 model = UserModel()
-parser = init_reqparser()
+
+SORTABLE = {
+    'id': UserModel.id,
+    'pseudo': UserModel.pseudo,
+    'email': UserModel.email,
+    'created_at': UserModel.created_at,
+    'updated_at': UserModel.updated_at,
+}
+
+parser = init_reqparser(SORTABLE)
 
 def bulkPost(userList):
     result = []
@@ -54,9 +68,24 @@ def bulkPost(userList):
 
     return result
 
+def user_sources(users, fields=None):
+    sources = [(users, UserModel)]
+    if wanted(fields, 'sequences'):
+        sources.append((SequenceModel.query.filter(SequenceModel.user_id.in_(users.with_entities(UserModel.id).subquery())), SequenceModel))
+    return sources
+
+def user_list(user, fields=None):
+    result = as_dict(user, unloaded_fields=unloaded_columns(UserModel, fields, ('password',)), special_fields={'role': 'enum'})
+    if wanted(fields, 'sequences'):
+        sequences = []
+        [sequences.append(s.as_dict(unloaded_fields=['user_id'])) for s in user.sequences]
+        result['sequences'] = sequences
+    return result
+
 class Users(Resource):
     @admin_required
     @jwt_needed
+    @read_only
     def get(self):
         """
         Lister tous les comptes
@@ -67,7 +96,7 @@ class Users(Resource):
             - in: query
               name: sort
               type: string
-              description: Examples = sort=end_date (sort by end_date ascending) ; sort=-end_date (sort by end_date descending)
+              description: Comma separated fields among id, pseudo, email, created_at, updated_at, ascending (field) or descending (-field), id breaks ties. Examples = sort=pseudo (sort by pseudo ascending) ; sort=-updated_at (last updated first)
             - in: query
               name: offset
               type: integer
@@ -76,6 +105,23 @@ class Users(Resource):
               name: limit
               type: integer
               description: The numbers of items to return
+            - in: query
+              name: cursor
+              type: string
+              description: Cursor pagination, empty for the first page then the `next_cursor` of the previous page (`limit` items per page, sorted by `sort` or by creation date)
+            - in: query
+              name: count
+              type: string
+              enum: [exact, estimated]
+              description: Add the `total` number of items of the list, counted with the page (exact) or read from the planner statistics (estimated, for large lists)
+            - in: query
+              name: stream
+              type: boolean
+              description: Stream the list while rows are read from the database (flat memory on large lists)
+            - in: query
+              name: fields
+              type: string
+              description: Comma separated fields to return (id is always returned), the other columns are not read from the database
         responses:
             200:
                 description: A list of users
@@ -91,28 +137,18 @@ class Users(Resource):
         if role and contains(role, ['ADMIN', 'USER']):
             users = users.filter_by(role=role)
 
-        users = query_apply_reqparser(UserModel, users, args)
-        users = users.all()
-        output = [] 
-        for user in users: 
-            sequences = []
-            [sequences.append(s.as_dict(unloaded_fields=['user_id'])) for s in user.sequences]
-            output.append({ 
-                'id': user.id,
-                'pseudo': user.pseudo, 
-                'name' : user.name, 
-                'email' : user.email, 
-                'group_id' : user.group_id, 
-                'role' : {
-                    "code": user.role.name,
-                    "label": user.role.value
-                },
-                'created_at': user.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'updated_at': user.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'sequences' : sequences
-            }) 
+        fields = requested_fields()
+        validator = freshness(*user_sources(users, fields))
+        if is_fresh(validator):
+            return not_modified(validator)
+
+        page = query_apply_reqparser(UserModel, users, args)
 
-        return make_response(jsonify({'users': output}), 200)
+        users = query_apply_fields(UserModel, page.query, fields)
+        if wanted(fields, 'sequences'):
+            users = users.options(undefer_payload(UserModel.sequences))
+
+        return add_validators(list_response('users', users, lambda user: user_list(user, fields), page), validator)
 
     @admin_required
     @jwt_needed
@@ -162,7 +198,7 @@ class Users(Resource):
             400:
                 description: wrong body content
         """
-        data = check_data(model, request.data)
+        data = check_data(model, request_body())
 
         if 'error' in data:
             return make_response(data, 400)
@@ -225,6 +261,10 @@ class User(Resource):
               type: string
               format: uuid
               description: user id
+            - in: query
+              name: fields
+              type: string
+              description: Comma separated fields to return (id is always returned), the other columns are not read from the database
         responses:
             200:
                 description: A user account
@@ -234,7 +274,15 @@ class User(Resource):
             404:
                 description: user id not found
         """
-        user = model.query.get(id)
+        fields = requested_fields()
+        validator = freshness(*user_sources(model.query.filter_by(id=id), fields))
+        if is_fresh(validator):
+            return not_modified(validator)
+
+        users = query_apply_fields(UserModel, model.query, fields)
+        if wanted(fields, 'sequences'):
+            users = users.options(undefer_payload(UserModel.sequences))
+        user = users.get(id)
         
         if not user:
             return make_response( 
@@ -242,22 +290,7 @@ class User(Resource):
                 404
             ) 
         else:
-            sequences = []
-            [sequences.append(s.as_dict(unloaded_fields=['user_id'])) for s in user.sequences]
-            return make_response(jsonify({
-                'id': user.id,
-                'pseudo': user.pseudo, 
-                'name' : user.name, 
-                'email' : user.email, 
-                'group_id' : user.group_id, 
-                'role' : {
-                    "code": user.role.name,
-                    "label": user.role.value
-                },
-                'created_at': user.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'updated_at': user.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'sequences' : sequences
-            }), 200)
+            return add_validators(make_response(jsonify(user_list(user, fields)), 200), validator)
     
     @admin_required
     @jwt_needed
@@ -303,7 +336,7 @@ class User(Resource):
             404:
                 description: user id not found
         """
-        user = model.query.get(id)
+        user = model.query.options(undefer_payload(UserModel.sequences)).get(id)
         
         if not user:
             return make_response( 
@@ -311,7 +344,7 @@ class User(Resource):
                 404
             ) 
         else:
-            data = check_data(model, request.data)
+            data = check_data(model, request_body())
 
             if 'error' in data:
                 return make_response(data, 400)
@@ -4,20 +4,28 @@
 import json
 import uuid
 
-from flask import jsonify, request, make_response 
-from flask_restful import Resource, reqparse
+from flask import make_response 
+from flask_restful import Resource, reqparse, inputs
 
+from sqlalchemy import func
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
 
 from utils.jwt import admin_required, jwt_needed, token_identity
+from utils.json_provider import jsonify
+from utils.msgpack_provider import request_body
 
 from werkzeug.security import generate_password_hash
 
 from db import conn
+from db.routing import read_only
 from db.models import UserGroup as UserGroupModel
 from db.models import User as UserModel, UserRoles
+from db.models import Challenge as ChallengeModel
 
-from utils.resource import init_reqparser, query_apply_reqparser
+from utils.conditional import freshness, is_fresh, not_modified, add_validators
+from utils.model import as_dict, unloaded_columns
+from utils.resource import init_reqparser, query_apply_reqparser, query_apply_fields, requested_fields, wanted, list_body
 from utils.sanitizers import check_data
 from utils.utils import contains
 
@@ -26,7 +34,14 @@ from resources.user import bulkPost as userBulkPost
 db = conn.db
 
 model = UserGroupModel()
-parser = init_reqparser()
+
+SORTABLE = {
+    'id': UserGroupModel.id,
+    'name': UserGroupModel.name,
+    'created_at': UserGroupModel.created_at,
+}
+
+parser = init_reqparser(SORTABLE)
 
 def generateUsers(group_id, userNb):
     if not userNb:
@@ -46,8 +61,55 @@ def generateUsers(group_id, userNb):
 
         return userBulkPost(result)
 
+def usergroup_sources(usergroups, fields=None):
+    sources = [(usergroups, UserGroupModel)]
+    groups = usergroups.with_entities(UserGroupModel.id).subquery()
+    if wanted(fields, 'users'):
+        sources.append((UserModel.query.filter(UserModel.group_id.in_(groups)), UserModel))
+    if wanted(fields, 'challenges'):
+        sources.append((ChallengeModel.query.filter(ChallengeModel.group_id.in_(groups)), ChallengeModel))
+    return sources
+
+def query_apply_loading(usergroups, fields=None):
+    # users and challenges of every group in one SELECT ... IN each, whatever the number of groups
+    if wanted(fields, 'users'):
+        usergroups = usergroups.options(selectinload(UserGroupModel.users))
+    if wanted(fields, 'challenges'):
+        usergroups = usergroups.options(selectinload(UserGroupModel.challenges))
+    return usergroups
+
+def usergroup_list(usergroup, fields=None):
+    result = as_dict(usergroup, unloaded_fields=unloaded_columns(UserGroupModel, fields))
+    if wanted(fields, 'users'):
+        result['users'] = [s.as_dict(unloaded_fields=['group_id']) for s in usergroup.users]
+    if wanted(fields, 'challenges'):
+        result['challenges'] = [s.as_dict(unloaded_fields=['group_id']) for s in usergroup.challenges]
+    return result
+
+def usergroup_summary(usergroups, args):
+    # one query: the groups joined with their user and challenge counts, grouped in SQL
+    users = db.session.query(UserModel.group_id, func.count(UserModel.id).label('count'))\
+        .group_by(UserModel.group_id).subquery()
+    challenges = db.session.query(ChallengeModel.group_id, func.count(ChallengeModel.id).label('count'))\
+        .group_by(ChallengeModel.group_id).subquery()
+
+    rows = usergroups\
+        .outerjoin(users, users.c.group_id == UserGroupModel.id)\
+        .outerjoin(challenges, challenges.c.group_id == UserGroupModel.id)\
+        .with_entities(UserGroupModel, func.coalesce(users.c.count, 0), func.coalesce(challenges.c.count, 0))
+    page = query_apply_reqparser(UserGroupModel, rows, args)
+
+    return list_body(
+        'usergroups',
+        page.query.all(),
+        lambda row: {'id': row[0].id, 'name': row[0].name, 'users_count': row[1], 'challenges_count': row[2]},
+        page,
+        entity=lambda row: row[0]
+    )
+
 class UserGroups(Resource):
     @jwt_needed
+    @read_only
     def get(self):
         """
         Lister tous les groupes d'utilisateurs
@@ -58,7 +120,7 @@ class UserGroups(Resource):
             - in: query
               name: sort
               type: string
-              description: Examples = sort=name (sort by end_date ascending) ; sort=-name (sort by end_date descending)
+              description: Comma separated fields among id, name, created_at, ascending (field) or descending (-field), id breaks ties. Examples = sort=name (sort by name ascending) ; sort=-name (sort by name descending)
             - in: query
               name: offset
               type: integer
@@ -67,6 +129,23 @@ class UserGroups(Resource):
               name: limit
               type: integer
               description: The numbers of items to return
+            - in: query
+              name: cursor
+              type: string
+              description: Cursor pagination, empty for the first page then the `next_cursor` of the previous page (`limit` items per page, sorted by `sort` or by creation date)
+            - in: query
+              name: count
+              type: string
+              enum: [exact, estimated]
+              description: Add the `total` number of items of the list, counted with the page (exact) or read from the planner statistics (estimated, for large lists)
+            - in: query
+              name: fields
+              type: string
+              description: Comma separated fields to return (id is always returned), the other columns are not read from the database
+            - in: query
+              name: summary
+              type: boolean
+              description: Only the id, name and numbers of users and challenges of every group
         responses:
             200:
                 description: A list of users groups
@@ -74,30 +153,27 @@ class UserGroups(Resource):
                     type: array
                     $ref: '#/definitions/usergroup'
         """
+        parser.add_argument('summary', type=inputs.boolean, help='Only the numbers of users and challenges, `true` or `false`')
         args = parser.parse_args()
 
         usergroups = model.query
+
+        summary = args['summary']
+        fields = None if summary else requested_fields()
+        validator = freshness(*usergroup_sources(usergroups, fields))
+        if is_fresh(validator):
+            return not_modified(validator)
+
+        if summary:
+            return add_validators(make_response(jsonify(usergroup_summary(usergroups, args)), 200), validator)
           
-        usergroups = query_apply_reqparser(UserGroupModel, usergroups, args)
-        usergroups = usergroups.all()
-
-        output = [] 
-
-        for usergroup in usergroups:
-            users = []
-            [users.append(s.as_dict(unloaded_fields=['group_id'])) for s in usergroup.users]
-            challenges = []
-            [challenges.append(s.as_dict(unloaded_fields=['group_id'])) for s in usergroup.challenges]
-            output.append({ 
-                'id': usergroup.id,
-                'name': usergroup.name,
-                'created_at': usergroup.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'updated_at': usergroup.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'users': users,
-                'challenges': challenges
-            })
+        page = query_apply_reqparser(UserGroupModel, usergroups, args)
 
-        return make_response(jsonify({'usergroups': output}), 200)
+        usergroups = query_apply_fields(UserGroupModel, page.query, fields)
+        usergroups = query_apply_loading(usergroups, fields)
+        output = list_body('usergroups', usergroups.all(), lambda usergroup: usergroup_list(usergroup, fields), page)
+
+        return add_validators(make_response(jsonify(output), 200), validator)
 
     @admin_required
     @jwt_needed
@@ -130,7 +206,7 @@ class UserGroups(Resource):
             400:
                 description: wrong body content
          """
-        data = check_data(model, request.data)
+        data = check_data(model, request_body())
         
         if 'error' in data:
             return make_response(data, 400)
@@ -185,6 +261,10 @@ class UserGroup(Resource):
               type: string
               format: uuid
               description: usergroup id
+            - in: query
+              name: fields
+              type: string
+              description: Comma separated fields to return (id is always returned), the other columns are not read from the database
         responses:
             200:
                 description: A User Group
@@ -192,7 +272,12 @@ class UserGroup(Resource):
                     type: object
                     $ref: '#/definitions/usergroup'
         """
-        usergroup = model.query.get(id)
+        fields = requested_fields()
+        validator = freshness(*usergroup_sources(model.query.filter_by(id=id), fields))
+        if is_fresh(validator):
+            return not_modified(validator)
+
+        usergroup = query_apply_loading(query_apply_fields(UserGroupModel, model.query, fields), fields).get(id)
         
         if not usergroup:
             return make_response( 
@@ -200,18 +285,7 @@ class UserGroup(Resource):
                 404
             ) 
         else:
-            users = []
-            [users.append(s.as_dict(unloaded_fields=['group_id'])) for s in usergroup.users]
-            challenges = []
-            [challenges.append(s.as_dict(unloaded_fields=['group_id'])) for s in usergroup.challenges]
-            return make_response(jsonify({
-                'id': usergroup.id,
-                'name': usergroup.name,
-                'created_at': usergroup.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'updated_at': usergroup.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'users' : users,
-                'challenges': challenges
-            }), 200)
+            return add_validators(make_response(jsonify(usergroup_list(usergroup, fields)), 200), validator)
 
     @admin_required
     @jwt_needed
@@ -257,7 +331,7 @@ class UserGroup(Resource):
                 404
             ) 
         else:
-            data = check_data(model, request.data, to_update=True)
+            data = check_data(model, request_body(), to_update=True)
 
             if 'error' in data:
                 return make_response(data, 400)
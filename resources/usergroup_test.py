@@ -2,11 +2,12 @@
 #coding: utf-8
 
 import config
+import gzip
 from conftest import get_fixtures
 
 model = 'usergroups'
 
-def test_usergroup(client, api_standard_tests):
+def test_usergroup(client, api_standard_tests, max_queries):
 
     assert api_standard_tests(
         client = client, 
@@ -57,6 +58,49 @@ def test_usergroup(client, api_standard_tests):
     assert len(d['users']) == 1
     assert len(d['challenges']) == 1
 
+    print('\nGet usergroups gzip compressed')
+    plain = client.get('/api/usergroups', headers={"Authorization": "Bearer "+admin_token})
+    r = client.get('/api/usergroups', headers={"Authorization": "Bearer "+admin_token, "Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert 'Accept-Encoding' in r.headers['Vary']
+    if len(plain.data) >= config.getConfigKey('compression.min_size', 1024):
+        assert r.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(r.data) == plain.data
+
+    print('\nGET usergroups list loads users and challenges in a fixed number of queries')
+    with max_queries(4):
+        r = client.get('/api/usergroups', headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
+
+    print('\nGET usergroups summary counts users and challenges in SQL')
+    with max_queries(2):
+        r = client.get('/api/usergroups?summary=true', headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
+    summary = [g for g in r.json['usergroups'] if g['id'] == usergroup]
+    assert len(summary) == 1
+    assert summary[0]['users_count'] == 1
+    assert summary[0]['challenges_count'] == 1
+    assert 'users' not in summary[0]
+
+    print('\nGET usergroups with count returns the total of the list, not of the page, without an extra query')
+    total = len(client.get('/api/usergroups?summary=true', headers={"Authorization": "Bearer "+admin_token}).json['usergroups'])
+    with max_queries(4):
+        r = client.get('/api/usergroups?limit=1&count=exact', headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
+    assert len(r.json['usergroups']) == 1
+    assert r.json['total'] == total
+    assert r.json['total_estimated'] == False
+    r = client.get('/api/usergroups?summary=true&limit=1&cursor=&count=exact', headers={"Authorization": "Bearer "+admin_token})
+    assert r.json['total'] == total
+    r = client.get('/api/usergroups?limit=1&offset='+str(total)+'&count=exact', headers={"Authorization": "Bearer "+admin_token})
+    assert r.json['usergroups'] == []
+    assert r.json['total'] == total
+    r = client.get('/api/usergroups?limit=1&count=estimated', headers={"Authorization": "Bearer "+admin_token})
+    assert r.status_code == 200
+    assert isinstance(r.json['total'], int)
+    assert r.json['total_estimated'] == True
+    assert client.get('/api/usergroups?count=all', headers={"Authorization": "Bearer "+admin_token}).status_code == 400
+
     print('\nDelete challenge')
     assert client.delete('/api/challenges/'+challenge, headers={"Authorization": "Bearer "+admin_token}).status_code == 200
 
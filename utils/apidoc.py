@@ -0,0 +1,335 @@
+#!/usr/bin/python
+#coding: utf-8
+
+import hashlib
+import json
+import os
+import os.path
+
+import config
+
+from flask import Response, redirect, request, url_for
+
+SPEC_ENDPOINT = 'flasgger.apispec_1'
+SPEC_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'apispec.json')
+
+template = {
+  "swagger": "2.0",
+  "info": {
+    "title": "Farmbot School API",
+    "description": "API for farmbot's extended features in education",
+    "version": "0.1.0",
+    "contact": {
+      "name": "git repo",
+      "url": "https://github.com/incaya/farmbot-school-api",
+    }
+  },
+  "x-tagGroups": [
+      {
+        "name": "Connexion",
+        "tags": ["Créer un compte utilisateur", "Se connecter à l'application"]
+      },
+      {
+        "name": "Administration",
+        "tags": ["Gestion des comptes", "Paramétrage", "Défis"]
+      },
+      {
+        "name": "Fonctionnalités apprenants",
+        "tags": ["Séquences"]
+      }
+  ],
+  "definitions": {
+    "pin": {
+      "properties": {
+        "id": {
+          "type": "string",
+          "format": "uuid",
+          "description": "Pin id"
+        },
+        "material_type": {
+          "type": "string",
+          "description": "Material type",
+          "enum": ['PERIPHERAL', 'SENSOR']
+        },
+        "material_id": {
+            "type": "integer",
+            "description": "Pin number"
+        },
+        "action": {
+            "type": "string",
+            "description": "Action related to pin"
+        }
+      }
+    },
+    "usergroup": {
+      "properties": {
+        "id": {
+          "type": "string",
+          "format": "uuid",
+          "description": "UserGroup id"
+        },
+        "name": {
+          "type": "string",
+          "description": "UserGroup name"
+        },
+        "users": {
+          "type": "array",
+          "description": "UserGroup's users list",
+          "items": {
+            "type": "object",
+            "schema": {
+              "$ref": "#/definitions/user"
+            }
+          }
+        },
+        "challenges": {
+          "type": "array",
+          "description": "UserGroup's challenges list",
+          "items": {
+            "type": "object",
+            "schema": {
+              "$ref": "#/definitions/challenge"
+            }
+          }
+        }
+      }
+    },
+    "user": {
+      "properties": {
+        "id": {
+          "type": "string",
+          "format": "uuid",
+          "description": "User id"
+        },
+        "pseudo": {
+          "type": "string",
+          "description": "User pseudo"
+        },
+        "name": {
+          "type": "string",
+          "description": "User name"
+        },
+        "email": {
+          "type": "string",
+          "format": "email",
+          "description": "Email account"
+        },
+        "role": {
+          "type": "string",
+          "description": "user role",
+          "enum": ['Administrateur', 'Utilisateur']
+        },
+        "sequences": {
+          "type": "array",
+          "description": "User's sequences list",
+          "items": {
+            "type": "object",
+            "schema": {
+              "$ref": "#/definitions/sequence"
+            }
+          }
+        }
+      }
+    },
+    "challenge": {
+      "properties": {
+        "id": {
+          "type": "string",
+          "format": "uuid",
+          "description": "Challenge id"
+        },
+        "title": {
+          "type": "string",
+          "description": "Challenge title"
+        },
+        "end_date": {
+          "type": "string",
+          "format": "date",
+          "description": "Challenge end date"
+        },
+        "description": {
+          "type": "string",
+          "description": "Challenge description"
+        },
+        "active": {
+          "type": "boolean",
+          "description": "Challenge activation flag"
+        },
+        "group_id": {
+          "type": "string",
+          "format": "uuid",
+          "description": "User Group id"
+        },
+        "sequences": {
+          "type": "array",
+          "description": "Challenge's sequences list",
+          "items": {
+            "type": "object",
+            "schema": {
+              "$ref": "#/definitions/sequence"
+            }
+          }
+        }
+      }
+    },
+    "sequence": {
+      "properties": {
+        "id": {
+          "type": "string",
+          "format": "uuid",
+          "description": "Sequence id"
+        },
+        "challenge_id": {
+          "type": "string",
+          "format": "uuid",
+          "description": "Linked challenge (id)"
+        },
+        "user_id": {
+          "type": "string",
+          "format": "uuid",
+          "description": "Creator of the sequence (user id)"
+        },
+        "status": {
+          "type": "string",
+          "description": "Sequence status",
+          "enum": ['WIP', 'TO_PROCESS', 'PROCESS_WIP', 'PROCESSED']
+        },
+        "actions": {
+          "type": "array",
+          "description": "List of actions",
+          "items": {
+            "type": "object",
+            "properties": {
+              "position": {
+                "type": "integer"
+              },
+              "type": {
+                "type": "string",
+                "enum": ['find_home', 'humidity', 'move_absolute', 'move_relative', 'take_photo', 'wait', 'water']
+              },
+              "param": {
+                "type": "object"
+              }
+            }
+          }
+        },
+        "fb_seq_id": {
+          "type": "string",
+          "format": "integer",
+          "description": "Sequence id in farmbot app"
+        },
+        "comments": {
+          "type": "array",
+          "description": "List of user cemments",
+          "items": {
+            "schema": {
+              "#ref": "#/definitions/sequence_comment"
+            }
+          }
+        }
+      }
+    },
+    "sequence_comment": {
+      "properties": {
+        "user": {
+          "type": "object",
+          "properties": {
+            "id": {
+              "type": "string",
+              "format": "uuid",
+              "description": "User id"
+            },
+            "pseudo": {
+              "type": "string",
+              "description": "User pseudo"
+            }
+          }
+        },
+        "comment": {
+          "type": "string",
+          "description": "User comment"
+        }
+      }      
+    }
+  },
+  "securityDefinitions": {
+    "Bearer": {
+      "type": "apiKey",
+      "name": "Authorization",
+      "in": "header",
+      "description": "JWT Authorization header using the Bearer scheme. Example: \"Authorization: Bearer {token}\""
+    }
+  },
+  "security": [
+    {
+      "Bearer": [ ]
+    }
+  ]
+}
+
+class ApiSpec(object):
+    # serialized spec, built once and served with validators
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+
+    def response(self):
+        response = Response(self.body, mimetype='application/json')
+        response.set_etag(self.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = config.getConfigKey('docs.cache_max_age', 3600)
+        return response.make_conditional(request)
+
+def build_spec(app):
+    swagger = app.extensions['apispec_swagger']
+    with app.app_context():
+        spec = swagger.get_apispecs('apispec_1')
+    return json.dumps(spec, sort_keys=True).encode('utf-8')
+
+def write_spec(app, path=SPEC_FILE):
+    body = build_spec(app)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(body)
+    return path
+
+def init_docs(app):
+    # docs.mode: `runtime` builds the spec from the docstrings once, on first fetch
+    #            `precompiled` serves the file written by `flask apispec`, no yaml is parsed
+    #            `off` does not mount the docs at all
+    mode = config.getConfigKey('docs.mode', 'runtime')
+    if mode == 'off':
+        return app
+
+    # flasgger pulls jsonschema and friends, only import it when the docs are mounted
+    from flasgger import Swagger
+
+    spec_file = config.getConfigKey('docs.spec_file', SPEC_FILE)
+
+    if mode == 'precompiled':
+        Swagger(app, template=None)
+        with open(spec_file, 'rb') as f:
+            cached = [ApiSpec(f.read())]
+    else:
+        app.extensions['apispec_swagger'] = Swagger(app, template=template)
+        cached = []
+
+    def apispec():
+        if not cached:
+            cached.append(ApiSpec(build_spec(app)))
+        return cached[0].response()
+
+    app.view_functions[SPEC_ENDPOINT] = apispec
+
+    @app.cli.command('apispec')
+    def apispec_command():
+        """Write the OpenAPI spec to docs.spec_file (static/apispec.json by default)."""
+        if 'apispec_swagger' not in app.extensions:
+            raise RuntimeError('the spec can only be built with docs.mode set to runtime')
+        print('OpenAPI spec written to ' + write_spec(app, spec_file))
+
+    @app.route('/')
+    def homepage():
+       return redirect(url_for('flasgger.apidocs'))
+
+    return app
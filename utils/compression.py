@@ -0,0 +1,124 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# Response compression, negotiated on Accept-Encoding: brotli when the module is installed, gzip otherwise
+#
+#   - bodies under compression.min_size bytes are sent as is, the framing would cost more than it saves
+#   - streamed bodies (stream=true lists) go through a streaming compressor flushed on every chunk
+#   - bodies with an ETag (conditional GETs, the api spec) keep their compressed bytes in an LRU cache of
+#     compression.cache_size entries, keyed by a digest of the body and the encoding: the same body is not
+#     compressed twice. The ETag does not cover every byte of the body (the total of count=estimated comes from
+#     the planner statistics), it only tells which bodies are worth caching
+
+import hashlib
+import threading
+import zlib
+
+from collections import OrderedDict
+
+from flask import request
+
+import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ['application/json', 'application/msgpack', 'text/html', 'text/plain', 'text/css', 'application/javascript']
+
+class CompressedCache(object):
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        size = config.getConfigKey('compression.cache_size', 256)
+        with self.lock:
+            self.entries[key] = body
+            self.entries.move_to_end(key)
+            while len(self.entries) > size:
+                self.entries.popitem(last=False)
+
+compressed_cache = CompressedCache()
+
+def enabled():
+    return config.getConfigKey('compression.enabled', True)
+
+def encodings():
+    return ['br', 'gzip'] if brotli else ['gzip']
+
+def compressor(encoding):
+    if encoding == 'br':
+        return brotli.Compressor(quality=config.getConfigKey('compression.brotli_quality', 4))
+    # 16 + MAX_WBITS: gzip header and trailer instead of raw zlib
+    return zlib.compressobj(config.getConfigKey('compression.gzip_level', 6), zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+def compress(body, encoding):
+    c = compressor(encoding)
+    if encoding == 'br':
+        return c.process(body) + c.finish()
+    return c.compress(body) + c.flush()
+
+def compress_stream(chunks, encoding, c):
+    for chunk in chunks:
+        if encoding == 'br':
+            data = c.process(chunk) + c.flush()
+        else:
+            data = c.compress(chunk) + c.flush(zlib.Z_SYNC_FLUSH)
+        # a flushed chunk reaches the client right away, as it would uncompressed
+        if data:
+            yield data
+    yield c.finish() if encoding == 'br' else c.flush()
+
+def negotiate():
+    # client quality wins, `q=0` refuses an encoding
+    return request.accept_encodings.best_match(encodings())
+
+def compress_response(response):
+    if not enabled() or request.method == 'HEAD':
+        return response
+    if response.status_code < 200 or response.status_code in [204, 304] or response.direct_passthrough:
+        return response
+    if response.mimetype not in COMPRESSIBLE or 'Content-Encoding' in response.headers:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate()
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        # the compressor is built here, the generator runs once the request context is gone
+        response.response = compress_stream(response.response, encoding, compressor(encoding))
+        response.headers.pop('Content-Length', None)
+    else:
+        etag, weak = response.get_etag()
+        body = response.get_data()
+        if len(body) < config.getConfigKey('compression.min_size', 1024):
+            return response
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding) if etag else None
+        compressed = compressed_cache.get(key) if key else None
+        if compressed is None:
+            compressed = compress(body, encoding)
+            if key:
+                compressed_cache.set(key, compressed)
+        response.set_data(compressed)
+        # the compressed bytes differ from the identity ones, a strong validator has to become weak
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def init_compression(app):
+    app.after_request(compress_response)
+
+    return app
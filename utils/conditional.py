@@ -0,0 +1,82 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# Conditional GET: weak ETag and Last-Modified of a response, computed from the max(updated_at) and count(*) of the
+# rows it is built from (one aggregate query), so unchanged data is answered by a 304 without being serialized
+#
+#   validator = freshness((challenges, ChallengeModel), (sequences, SequenceModel))
+#   if is_fresh(validator):
+#       return not_modified(validator)
+#   ...
+#   return add_validators(response, validator)
+#
+# Every write bumps updated_at (see utils.sanitizers.populate_changes_dt) and deletes change the count, only the ETag
+# sees the latter: clients should prefer If-None-Match to If-Modified-Since. The request path (query string included),
+# the token identity and the format (json or msgpack) are part of the ETag: pages, fieldsets and per learner bodies get
+# their own validator.
+
+import hashlib
+
+from collections import namedtuple
+
+from flask import current_app, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import func
+
+import config
+
+from db import conn
+from utils.msgpack_provider import wants_msgpack
+
+db = conn.db
+
+Freshness = namedtuple('Freshness', ['etag', 'last_modified', 'rows'])
+
+def enabled():
+    return config.getConfigKey('api.conditional_requests', True)
+
+def freshness(*sources):
+    # sources are (query, model) pairs, queries before pagination and loader options, the first one gives the rows
+    # of the response (nothing to answer 304 for when it is empty, detail endpoints go on with their 404)
+    if not enabled():
+        return None
+
+    columns = []
+    for query, model in sources:
+        query = query.order_by(None).limit(None).offset(None)
+        columns.append(query.with_entities(func.max(model.updated_at)).as_scalar())
+        columns.append(query.with_entities(func.count(model.id)).as_scalar())
+    values = db.session.query(*columns).one()
+
+    dates = [v for v in values[::2] if v is not None]
+    identity = get_jwt_identity()
+    key = repr((request.full_path, str(identity) if identity else None, wants_msgpack(), [str(v) for v in values]))
+
+    return Freshness(
+        hashlib.sha1(key.encode('utf-8')).hexdigest(),
+        max(dates).replace(microsecond=0) if dates else None,
+        values[1]
+    )
+
+def is_fresh(validator):
+    if validator is None or not validator.rows:
+        return False
+    # If-None-Match wins over If-Modified-Since (rfc 7232, 3.3)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(validator.etag)
+    if request.if_modified_since and validator.last_modified:
+        return validator.last_modified <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+def add_validators(response, validator):
+    if validator is None:
+        return response
+    response.set_etag(validator.etag, weak=True)
+    if validator.last_modified:
+        response.last_modified = validator.last_modified
+    # without it browsers may reuse the body on heuristic freshness instead of revalidating
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def not_modified(validator):
+    return add_validators(current_app.response_class(status=304), validator)
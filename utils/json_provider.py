@@ -0,0 +1,120 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# JSON encoding of the api responses
+#
+# `jsonify` is a drop-in replacement of flask's one. With json.provider `auto` (default) or `orjson` the body is
+# encoded by orjson when it is installed, with `stdlib` (or without orjson) by the json module and flask's encoder.
+# Both give the same text: compact separators, sorted keys (JSON_SORT_KEYS), non ascii characters escaped
+# (JSON_AS_ASCII), uuids as strings and dates as http dates. Known differences of orjson: NaN/Infinity become null
+# and very large or very small floats are formatted differently, same value but another text: no exponent sign or
+# padding (1e16, 1e-7 instead of 1e+16, 1e-07) and another switch to exponent notation (0.00001 instead of 1e-05).
+# Clients asking for msgpack (utils.msgpack_provider) get the same data packed instead.
+
+import dataclasses
+import enum
+import json
+import re
+
+from datetime import date, datetime
+
+from flask import current_app, has_request_context
+from flask.json import JSONEncoder as FlaskJSONEncoder
+from werkzeug.http import http_date
+
+import config
+
+from utils.msgpack_provider import msgpack_response, wants_msgpack
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class JSONEncoder(FlaskJSONEncoder):
+    def default(self, o):
+        if isinstance(o, enum.Enum):
+            return o.value
+        return FlaskJSONEncoder.default(self, o)
+
+def orjson_default(o):
+    # uuids, enums and JSONB lists/dicts are native to orjson, what follows mimics flask's encoder
+    if isinstance(o, datetime):
+        return http_date(o.utctimetuple())
+    if isinstance(o, date):
+        return http_date(o.timetuple())
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError
+
+if orjson:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+# json.dumps(ensure_ascii=True) also escapes DEL
+_non_ascii = re.compile('[^\x00-\x7e]')
+
+def escape_non_ascii(match):
+    # surrogate pairs above the basic plane, as json.dumps does
+    n = ord(match.group(0))
+    if n < 0x10000:
+        return '\\u%04x' % n
+    n -= 0x10000
+    return '\\u%04x\\u%04x' % (0xd800 | (n >> 10), 0xdc00 | (n & 0x3ff))
+
+def provider():
+    name = str(config.getConfigKey('json.provider', 'auto')).lower()
+    if name in ['auto', 'orjson'] and orjson:
+        return 'orjson'
+    return 'stdlib'
+
+def dumpb(obj, app=None):
+    app = app or current_app
+    if app.config.get('JSON_PROVIDER') == 'orjson':
+        option = ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if app.config['JSON_SORT_KEYS'] else 0)
+        try:
+            rv = orjson.dumps(obj, default=orjson_default, option=option)
+        except orjson.JSONEncodeError:
+            # integers over 64 bits, lone surrogates... the stdlib either encodes them or raises the usual error
+            pass
+        else:
+            if app.config['JSON_AS_ASCII'] and (not rv.isascii() or b'\x7f' in rv):
+                rv = _non_ascii.sub(escape_non_ascii, rv.decode('utf-8')).encode('ascii')
+            return rv
+
+    return json.dumps(
+        obj,
+        cls=app.json_encoder,
+        ensure_ascii=app.config['JSON_AS_ASCII'],
+        sort_keys=app.config['JSON_SORT_KEYS'],
+        separators=(',', ':')
+    ).encode('utf-8')
+
+def jsonify(*args, **kwargs):
+    if args and kwargs:
+        raise TypeError('jsonify() behavior undefined when passed both args and kwargs')
+    elif len(args) == 1:
+        data = args[0]
+    else:
+        data = args or kwargs
+
+    # like flask's jsonify, usable with only an app context (no Accept header to negotiate)
+    if has_request_context() and wants_msgpack():
+        return msgpack_response(data)
+
+    if current_app.config['JSONIFY_PRETTYPRINT_REGULAR'] or current_app.debug:
+        # pretty printed bodies are for humans, flask's encoder keeps its exact layout
+        from flask import jsonify as flask_jsonify
+        return flask_jsonify(data)
+
+    return current_app.response_class(
+        dumpb(data) + b'\n',
+        mimetype=current_app.config['JSONIFY_MIMETYPE']
+    )
+
+def init_json(app):
+    app.json_encoder = JSONEncoder
+    app.config['JSON_PROVIDER'] = provider()
+
+    return app
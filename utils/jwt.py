@@ -54,7 +54,7 @@ class JWT(object):
 
     def init_app(self, app, **kwargs):
         app.config['JWT_SECRET_KEY'] = config.getConfigKey('jwt.secret_key')
-        app.config['JWT_ACCESS_TOKEN_EXPIRES'] = int(config.getConfigKey('jwt.expiration_time'))
+        app.config['JWT_ACCESS_TOKEN_EXPIRES'] = config.getConfigKey('jwt.expiration_time')
 
         jwt = JWTManager(app)
 
@@ -0,0 +1,84 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# Prometheus instrumentation of every route
+#
+# With several gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory before the workers start
+# and call `child_exit` from the gunicorn `child_exit` hook, samples of all workers are then merged on /metrics
+
+import os
+import time
+
+from flask import Response, g, request
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency in seconds',
+    ['endpoint', 'method'], buckets=LATENCY_BUCKETS
+)
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'Requests count by status code',
+    ['endpoint', 'method', 'status']
+)
+REQUEST_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requests currently being processed',
+    ['endpoint', 'method'], multiprocess_mode='livesum'
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Response body size in bytes',
+    ['endpoint', 'method'], buckets=SIZE_BUCKETS
+)
+
+def multiprocess_dir():
+    return os.getenv('PROMETHEUS_MULTIPROC_DIR') or os.getenv('prometheus_multiproc_dir')
+
+def endpoint_label():
+    # the route template, not the path, keeps ids out of the label values
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_labels = (endpoint_label(), request.method)
+    REQUEST_IN_FLIGHT.labels(*g.metrics_labels).inc()
+
+def after_request(response):
+    labels = g.get('metrics_labels')
+    if not labels:
+        return response
+
+    REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - g.metrics_start)
+    REQUEST_COUNT.labels(labels[0], labels[1], str(response.status_code)).inc()
+    # streamed bodies are only measured when they announce their length
+    size = response.content_length if response.is_streamed else response.calculate_content_length()
+    if size is not None:
+        RESPONSE_SIZE.labels(*labels).observe(size)
+    return response
+
+def teardown_request(exc):
+    labels = g.pop('metrics_labels', None)
+    if labels:
+        REQUEST_IN_FLIGHT.labels(*labels).dec()
+
+def metrics():
+    registry = REGISTRY
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+def child_exit(server, worker):
+    # gunicorn hook, drops the live gauges of a dead worker
+    if multiprocess_dir():
+        multiprocess.mark_process_dead(worker.pid)
+
+def init_metrics(app):
+    app.before_request(before_request)
+    app.after_request(after_request)
+    app.teardown_request(teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics)
+
+    return app
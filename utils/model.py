@@ -1,5 +1,3 @@
-import datetime
-
 def is_mandatory(field_list, field):
     for k,v in field_list.items():
         if k == field and 'mandatory' in v and v['mandatory']:
@@ -26,26 +24,70 @@ def not_allow_empty_fields(field_list):
             f.append(k)
     return f
 
-def as_dict(obj, **kwargs):
-    special_fields = kwargs.get('special_fields')
-    fields = [f.name for f in obj.__table__.columns]
-    loaded_fields = [f for f in fields if f not in kwargs.get('unloaded_fields')] if kwargs.get('unloaded_fields') else fields
-    result = {}
-    for c in loaded_fields:
-        if not special_fields or c not in special_fields:
-            if c == 'created_at' or c == 'updated_at':
-                result[c] = getattr(obj, c).strftime('%Y-%m-%d %H:%M:%S') if getattr(obj, c) else None
-            else:
-                result[c] = getattr(obj, c)
-        elif special_fields[c] == 'enum':
-            result[c] = {
-                'code': getattr(obj, c).name if getattr(obj, c) else None,
-                'label': getattr(obj, c).value if getattr(obj, c) else None
-            }
-        elif special_fields[c] == 'date':
-            result[c] = getattr(obj, c).strftime('%Y-%m-%d') if getattr(obj, c) else None
-        elif special_fields[c] == 'datetime':
-            result[c] = getattr(obj, c).strftime('%Y-%m-%d %H:%M:%S') if getattr(obj, c) else None
+def format_enum(value):
+    return {
+        'code': value.name if value else None,
+        'label': value.value if value else None
+    }
+
+def format_date(value):
+    if not value:
+        return None
+    # isoformat is the same text as strftime('%Y-%m-%d') for 4 digit years, at a fraction of the cost
+    return value.isoformat()[:10] if value.year >= 1000 else value.strftime('%Y-%m-%d')
+
+def format_datetime(value):
+    if not value:
+        return None
+    return value.isoformat(' ')[:19] if value.year >= 1000 else value.strftime('%Y-%m-%d %H:%M:%S')
+
+FORMATTERS = {
+    'enum': format_enum,
+    'date': format_date,
+    'datetime': format_datetime
+}
+
+_serializers = {}
+
+def compile_serializer(cls, unloaded_fields=None, special_fields=None):
+    fields = []
+    for c in cls.__table__.columns:
+        if unloaded_fields and c.name in unloaded_fields:
+            continue
+        if not special_fields or c.name not in special_fields:
+            formatter = format_datetime if c.name in ('created_at', 'updated_at') else None
         else:
-            result[c] = getattr(obj, c)
-    return result
+            formatter = FORMATTERS.get(special_fields[c.name])
+        fields.append((c.name, formatter))
+    fields = tuple(fields)
+
+    def serialize(obj):
+        # loaded columns are read from the instance state, anything else (expired, deferred) goes through the orm
+        state = obj.__dict__
+        result = {}
+        for name, formatter in fields:
+            value = state[name] if name in state else getattr(obj, name)
+            result[name] = formatter(value) if formatter is not None else value
+        return result
+    return serialize
+
+def unloaded_columns(cls, fields, unloaded_fields=()):
+    # columns a sparse fieldset (None: every field) leaves out of the output
+    if fields is None:
+        return tuple(unloaded_fields)
+    return tuple(c.name for c in cls.__table__.columns if c.name in unloaded_fields or c.name not in fields)
+
+def serializer(cls, unloaded_fields=None, special_fields=None):
+    # built once per model and options, as_dict only looks it up
+    key = (
+        cls,
+        tuple(unloaded_fields) if unloaded_fields else (),
+        tuple(special_fields.items()) if special_fields else ()
+    )
+    serialize = _serializers.get(key)
+    if serialize is None:
+        serialize = _serializers[key] = compile_serializer(cls, unloaded_fields, special_fields)
+    return serialize
+
+def as_dict(obj, **kwargs):
+    return serializer(type(obj), kwargs.get('unloaded_fields'), kwargs.get('special_fields'))(obj)
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# MessagePack representation of the api, for clients sending `Accept: application/msgpack` (answers) and
+# `Content-Type: application/msgpack` (request bodies, see request_body)
+#
+# Values are the ones of the json body: uuids as strings, enums as values, dates as http dates. Only used when the
+# msgpack module is installed and msgpack.enabled is set, clients get json otherwise. Streamed lists are sent in one
+# piece, a msgpack array needs its length before its items.
+
+import dataclasses
+import enum
+import json
+import uuid
+
+from datetime import date, datetime
+
+from flask import abort, current_app, request
+from flask_restful.representations.json import output_json
+from werkzeug.http import http_date
+
+import config
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+MSGPACK_MIMETYPES = [MSGPACK_MIMETYPE, 'application/x-msgpack']
+
+def msgpack_default(o):
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if isinstance(o, enum.Enum):
+        return o.value
+    if isinstance(o, datetime):
+        return http_date(o.utctimetuple())
+    if isinstance(o, date):
+        return http_date(o.timetuple())
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError('Object of type %s is not MessagePack serializable' % type(o).__name__)
+
+def enabled():
+    return msgpack is not None and config.getConfigKey('msgpack.enabled', True)
+
+def wants_msgpack():
+    # json stays the answer to browsers and `*/*`, msgpack has to be asked for
+    if not enabled():
+        return False
+    return request.accept_mimetypes.best_match(['application/json'] + MSGPACK_MIMETYPES) in MSGPACK_MIMETYPES
+
+def packb(obj):
+    return msgpack.packb(obj, default=msgpack_default, use_bin_type=True)
+
+def msgpack_response(data, status=200, headers=None):
+    return current_app.response_class(packb(data), status=status, headers=headers, mimetype=MSGPACK_MIMETYPE)
+
+def output_msgpack(data, code, headers=None):
+    # flask-restful representation, for the dicts returned by the resources
+    if not enabled():
+        return output_json(data, code, headers)
+    return msgpack_response(data, code, headers)
+
+def invalid_body(message):
+    # same answer as utils.resource.error_response, built here: utils.json_provider imports this module
+    abort(current_app.response_class(
+        json.dumps({"error": {"message": message}}),
+        status=400,
+        mimetype='application/json'
+    ))
+
+def request_body():
+    # the body as utils.sanitizers.check_data takes it: decoded for msgpack, the raw json text otherwise
+    if msgpack is not None and request.mimetype in MSGPACK_MIMETYPES:
+        try:
+            data = msgpack.unpackb(request.get_data(), raw=False)
+        except (ValueError, TypeError):
+            invalid_body('request body is not valid msgpack')
+        if not isinstance(data, dict):
+            invalid_body('request body must be a msgpack map')
+        return data
+    return request.get_data()
+
+def transcode(response):
+    # answers built without utils.json_provider.jsonify (flask's make_response of a dict...) on the same format
+    if not request.path.startswith('/api/'):
+        return response
+    response.vary.add('Accept')
+    if response.mimetype != 'application/json' or response.is_streamed or response.direct_passthrough:
+        return response
+    if not wants_msgpack():
+        return response
+    try:
+        data = json.loads(response.get_data())
+    except ValueError:
+        return response
+    response.set_data(packb(data))
+    response.mimetype = MSGPACK_MIMETYPE
+    return response
+
+def init_msgpack(app, api=None):
+    if api is not None and msgpack is not None:
+        for mimetype in MSGPACK_MIMETYPES:
+            api.representations[mimetype] = output_msgpack
+    app.after_request(transcode)
+
+    return app
@@ -0,0 +1,195 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# On demand profiling of a request, for administrators only
+#
+# Send `X-Profile: 1` (or `?profile=1`) with an admin token, the request runs under cProfile and the answer
+# carries `X-Profile-Id` and a `Server-Timing` header splitting the time between sql, serialization and farmbot.
+# The slowest profiles are kept in profiling.dir, shared by the workers of a host, see /api/admin/profiles
+
+import cProfile
+import json
+import os
+import pstats
+import tempfile
+import time
+import uuid
+
+from flask import g, request
+
+import config
+
+from utils.jwt import admin_required
+
+# (category, file suffix, function names) whose cumulative time is reported
+CATEGORIES = [
+    ('sql', '/sqlalchemy/engine/default.py', ['do_execute', 'do_executemany', 'do_execute_no_params']),
+    # the compiled serializer closure: as_dict and the sequence representations of utils.serializers both call it
+    ('serialization', '/utils/model.py', ['serialize']),
+    ('farmbot', '/requests/sessions.py', ['request'])
+]
+
+def profiles_dir():
+    return config.getConfigKey('profiling.dir', None) or os.path.join(tempfile.gettempdir(), 'farmbot-school-profiles')
+
+def profiles_keep():
+    return config.getConfigKey('profiling.keep', 20)
+
+def requested():
+    flag = request.headers.get('X-Profile') or request.args.get('profile')
+    if str(flag).lower() not in ['true', '1']:
+        return False
+    # the usual decorator decides, anyone else gets the request served without profiling
+    return admin_required(lambda: True)() is True
+
+def category_of(func):
+    filename, lineno, name = func
+    filename = filename.replace('\\', '/')
+    for category, suffix, names in CATEGORIES:
+        if name in names and filename.endswith(suffix):
+            return category
+    return None
+
+def share_under(stats, func, category, memo, visiting):
+    # part (0 to 1) of the cumulative time of func spent below a function of category. pstats only keeps
+    # direct callers: the time received from each caller is weighted by the share of that caller, recursively
+    if category_of(func) == category:
+        return 1.0
+    if func in memo:
+        return memo[func]
+    if func in visiting:
+        # recursion, the time is already counted by the outer call
+        return 0.0
+    visiting.add(func)
+    cc, nc, tt, ct, callers = stats.stats[func]
+    share = 0.0
+    if ct > 0:
+        for caller, (c_cc, c_nc, c_tt, c_ct) in callers.items():
+            if caller in stats.stats:
+                share += c_ct * share_under(stats, caller, category, memo, visiting)
+        share = min(share / ct, 1.0)
+    visiting.discard(func)
+    memo[func] = share
+    return share
+
+def time_split(stats):
+    # exclusive buckets: the sql of lazy loads run while serializing is counted under sql only
+    split = {category: 0.0 for category, suffix, names in CATEGORIES}
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        category = category_of(func)
+        if category:
+            split[category] += ct
+
+    memo = {}
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        if category_of(func) == 'sql':
+            split['serialization'] -= ct * share_under(stats, func, 'serialization', memo, set())
+    split['serialization'] = max(split['serialization'], 0.0)
+    return split
+
+def list_profiles():
+    path = profiles_dir()
+    profiles = []
+    if not os.path.isdir(path):
+        return profiles
+
+    for filename in os.listdir(path):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(path, filename), 'r') as f:
+                profiles.append(json.loads(f.read()))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda p: p['duration_ms'], reverse=True)
+
+def profile_path(id):
+    # ids are generated here, anything else can not name a profile
+    if len(id) != 32 or any(c not in '0123456789abcdef' for c in id):
+        return None
+    path = os.path.join(profiles_dir(), id + '.prof')
+    return path if os.path.isfile(path) else None
+
+def remove_profile(id):
+    for ext in ['.prof', '.json']:
+        try:
+            os.remove(os.path.join(profiles_dir(), id + ext))
+        except OSError:
+            pass
+
+def store_profile(profile, meta):
+    profiles = list_profiles()
+    keep = profiles_keep()
+    if len(profiles) >= keep and profiles[keep - 1]['duration_ms'] >= meta['duration_ms']:
+        return False
+
+    path = profiles_dir()
+    try:
+        os.makedirs(path, exist_ok=True)
+        profile.dump_stats(os.path.join(path, meta['id'] + '.prof'))
+        tmp_path = os.path.join(path, meta['id'] + '.json.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(meta))
+        os.replace(tmp_path, os.path.join(path, meta['id'] + '.json'))
+    except OSError:
+        return False
+
+    for p in profiles[keep - 1:]:
+        remove_profile(p['id'])
+    return True
+
+def before_request():
+    if not requested():
+        return
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # another profiler is already running in this thread
+        return
+    g.profile = profile
+    g.profile_start = time.perf_counter()
+
+def after_request(response):
+    profile = g.pop('profile', None)
+    if not profile:
+        return response
+    profile.disable()
+    duration = time.perf_counter() - g.profile_start
+
+    split = time_split(pstats.Stats(profile))
+    stats = g.get('query_stats')
+    meta = {
+        'id': uuid.uuid4().hex,
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': request.url_rule.rule if request.url_rule else None,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'split_ms': {category: round(seconds * 1000, 3) for category, seconds in split.items()},
+        'queries': stats.count if stats else None,
+        'pid': os.getpid(),
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+    }
+    # the buckets do not overlap, only rounding can take their sum over the duration
+    meta['split_ms']['other'] = round(max(meta['duration_ms'] - sum(meta['split_ms'].values()), 0), 3)
+
+    if store_profile(profile, meta):
+        response.headers['X-Profile-Id'] = meta['id']
+    response.headers['Server-Timing'] = ', '.join(
+        '%s;dur=%.3f' % (category, ms) for category, ms in meta['split_ms'].items()
+    ) + ', total;dur=%.3f' % meta['duration_ms']
+    return response
+
+def teardown_request(exc):
+    # the request failed before after_request, the profiler must not outlive it
+    profile = g.pop('profile', None)
+    if profile:
+        profile.disable()
+
+def init_profiling(app):
+    app.before_request(before_request)
+    app.after_request(after_request)
+    app.teardown_request(teardown_request)
+
+    return app
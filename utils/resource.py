@@ -1,23 +1,267 @@
-from flask_restful import reqparse
+import base64
+import datetime
+import enum
+import json
+import uuid
 
-def init_reqparser():
+from collections import namedtuple
+
+import config
+
+from flask import abort, current_app, make_response, request, stream_with_context
+from flask_restful import inputs, reqparse
+from sqlalchemy import and_, false, func, literal, or_, text, tuple_
+from sqlalchemy import types
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import load_only
+
+from db import conn
+from db.explain import explain
+
+from utils.json_provider import dumpb, jsonify
+from utils.msgpack_provider import wants_msgpack
+
+STREAM_CHUNK_SIZE = 65536
+
+db = conn.db
+
+# cursor pages are ordered by the sort keys then id, by creation date when no sort is given
+CURSOR_DEFAULT_SORT = 'created_at'
+
+SortKey = namedtuple('SortKey', ['name', 'column', 'desc'])
+
+def sort_argument(sortable):
+    # reqparse type of `sort`: comma separated keys of the resource (-key for descending), a key outside of
+    # sortable is a 400 of parse_args, before any query runs
+    def parse(value):
+        keys = []
+        for key in value.split(','):
+            key = key.strip()
+            name = key[1:] if key[:1] == '-' else key
+            if not name:
+                continue
+            if name not in sortable:
+                raise ValueError('`%s` is not sortable, use %s' % (name, ', '.join(sorted(sortable))))
+            if name in [k.name for k in keys]:
+                raise ValueError('`%s` is sorted twice' % name)
+            keys.append(SortKey(name, sortable[name], key[:1] == '-'))
+        return keys
+    return parse
+
+def init_reqparser(sortable=None):
+    # sortable: the sort keys of the resource and the columns they order by. Only indexed columns are sortable
+    # (see the __table_args__ of db.models), a sorted page is then read from an index instead of sorting the table
     parser = reqparse.RequestParser()
     parser.add_argument('offset', type=int, help='The number of items to skip before starting to collect the result set')
     parser.add_argument('limit', type=int, help='The numbers of items to return')
-    parser.add_argument('sort', type=str, help='Sorting a field ascending (field) or descending (-field)')
-    
+    parser.add_argument('sort', type=sort_argument(sortable or {}), help='{error_msg}. Comma separated fields, ascending (field) or descending (-field)')
+    parser.add_argument('stream', type=inputs.boolean, help='Stream the list while rows are read from the database, `true` or `false`')
+    parser.add_argument('cursor', type=str, help='Cursor pagination: empty for the first page, then the `next_cursor` of the previous one')
+    parser.add_argument('count', type=str, choices=('exact', 'estimated'), help='Total number of items in the list, `exact` or `estimated`')
+
     return parser
 
+def error_response(message, status=400):
+    abort(make_response(jsonify({"error": {"message": message}}), status))
+
+def cursor_requested(args):
+    return args.get('cursor') is not None
+
+def page_size(args):
+    return args.get('limit') or config.getConfigKey('api.page_size', 50)
+
+def order_keys(model, keys):
+    # the requested keys then id, unique: the order is the same from one page to the next. id follows the
+    # direction of the last key, a (key, id) index is read in one direction
+    if any(k.name == 'id' for k in keys):
+        return list(keys)
+    return list(keys) + [SortKey('id', model.id, keys[-1].desc if keys else False)]
+
+def order_clauses(keys):
+    return [k.column.desc() if k.desc else k.column.asc() for k in keys]
+
+def sort_string(keys):
+    return ','.join(('-' if k.desc else '') + k.name for k in keys)
+
+def cursor_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.name
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+def encode_cursor(keys, row):
+    data = json.dumps([sort_string(keys), [cursor_value(getattr(row, k.name)) for k in keys]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+def cursor_key_value(key, value):
+    # value of a decoded cursor as the python type of its column, the inverse of cursor_value. ValueError or
+    # TypeError when it does not fit: a tampered cursor would otherwise fail in the database
+    column = key.column.expression
+    column_type = column.type
+    if value is None:
+        if not getattr(column, 'nullable', True):
+            raise ValueError(key.name)
+        return None
+    if isinstance(column_type, types.Enum):
+        if column_type.enum_class is not None:
+            return column_type.enum_class[value]
+        if value not in column_type.enums:
+            raise ValueError(key.name)
+        return value
+    if not isinstance(value, str) and not isinstance(column_type, (types.Integer, types.Boolean)):
+        raise TypeError(key.name)
+    if isinstance(column_type, UUID):
+        return uuid.UUID(value)
+    if isinstance(column_type, types.DateTime):
+        return datetime.datetime.fromisoformat(value)
+    if isinstance(column_type, types.Date):
+        return datetime.date.fromisoformat(value)
+    if isinstance(column_type, types.Boolean):
+        if not isinstance(value, bool):
+            raise TypeError(key.name)
+        return value
+    if isinstance(column_type, types.Integer):
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise TypeError(key.name)
+        return value
+    return value
+
+def decode_cursor(cursor, keys):
+    try:
+        sort, values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        error_response('invalid cursor')
+    if sort != sort_string(keys):
+        error_response('the cursor was made for another sort')
+    if not isinstance(values, list) or len(values) != len(keys):
+        error_response('invalid cursor')
+    try:
+        return [cursor_key_value(k, v) for k, v in zip(keys, values)]
+    except (KeyError, ValueError, TypeError):
+        error_response('invalid cursor')
+
+def key_after(key, value):
+    # rows after value in the order of key, nulls come last in ascending order and first in descending order
+    column = key.column.expression
+    if value is None:
+        return column.isnot(None) if key.desc else false()
+    if key.desc:
+        return column < literal(value, column.type)
+    if getattr(column, 'nullable', True):
+        return or_(column > literal(value, column.type), column.is_(None))
+    return column > literal(value, column.type)
+
+def key_equal(key, value):
+    column = key.column.expression
+    return column.is_(None) if value is None else column == literal(value, column.type)
+
+def keyset_filter(keys, values):
+    # rows after the one of the cursor: (k1 after) or (k1 equal and k2 after) or ... down to id
+    columns = [k.column.expression for k in keys]
+    if len(set(k.desc for k in keys)) == 1 and None not in values and not any(getattr(c, 'nullable', True) for c in columns):
+        # one direction and no null: a row value comparison, one range of a (keys..., id) index
+        row = tuple_(*columns)
+        cursor = tuple_(*[literal(v, c.type) for c, v in zip(columns, values)])
+        return row < cursor if keys[0].desc else row > cursor
+    return or_(*[
+        and_(*([key_equal(k, v) for k, v in zip(keys[:i], values[:i])] + [key_after(keys[i], values[i])]))
+        for i in range(len(keys))
+    ])
+
+class Page(object):
+    # a list as query_apply_reqparser paginated it, for list_body and list_response: the request arguments, the
+    # query of the page, the list before pagination (totals) and the order of cursor pages (next_cursor)
+    def __init__(self, args, model, query, base_query, order_keys=None):
+        self.args = args
+        self.model = model
+        self.query = query
+        self.base_query = base_query
+        self.order_keys = order_keys
+
+    @property
+    def count(self):
+        return self.args.get('count')
+
+    @property
+    def paginated(self):
+        return cursor_requested(self.args)
+
+def query_apply_cursor(model, query, args):
+    # keyset pagination: the page starts right after the row of the cursor, its cost does not depend on its depth
+    # returns the query and the keys it is ordered by
+    keys = order_keys(model, args.get('sort') or [SortKey(CURSOR_DEFAULT_SORT, getattr(model, CURSOR_DEFAULT_SORT), False)])
+
+    if args.get('count') == 'exact':
+        # a window would only count the rows after the cursor, the whole list is counted in the same statement
+        query = query.add_columns(query.with_entities(func.count(model.id)).order_by(None).correlate(None).as_scalar().label('total'))
+
+    if args['cursor']:
+        query = query.filter(keyset_filter(keys, decode_cursor(args['cursor'], keys)))
+
+    query = query.order_by(*order_clauses(keys))
+
+    # one more row than the page tells whether there is a next one
+    return query.limit(page_size(args) + 1), keys
+
+def next_cursor(row, page):
+    return encode_cursor(page.order_keys, row)
+
+def cursor_page(rows, page, entity=None):
+    # rows read by query_apply_cursor: the page and the cursor of the next one (None on the last page)
+    limit = page_size(page.args)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, next_cursor(entity(rows[-1]) if entity else rows[-1], page)
+
+def estimated_count(model, query):
+    # planner statistics: reltuples of the table when the list is not filtered, the estimate of its plan otherwise
+    query = query.order_by(None).limit(None).offset(None)
+    if query.whereclause is None:
+        table = db.engine.dialect.identifier_preparer.format_table(model.__table__)
+        total = db.session.execute(text('SELECT reltuples FROM pg_class WHERE oid = CAST(:table AS regclass)'), {'table': table}).scalar()
+        # -1 or 0 until the table is vacuumed or analyzed
+        if total is not None and total > 0:
+            return int(total)
+
+    return int(explain(query)['Plan Rows'])
+
+def split_total(row):
+    # rows of an exact count carry the total in their last column
+    return (row[0] if len(row) == 2 else tuple(row[:-1])), row[-1]
+
+def rows_total(rows, page):
+    if page.count == 'estimated':
+        return rows, estimated_count(page.model, page.base_query)
+    if page.count != 'exact':
+        return rows, None
+
+    split = []
+    total = None
+    for row in rows:
+        row, total = split_total(row)
+        split.append(row)
+    if total is None:
+        # no row to read it from (page after the last one)
+        total = page.base_query.order_by(None).count()
+    return split, total
+
 def query_apply_reqparser(model, query, args):
-    sort_arg = args['sort']
-    sort = model.id.asc()
-    if sort_arg:
-        sort = getattr(model, sort_arg.replace('-', ''))
-        if sort_arg[:1] == '-':
-            sort = sort.desc()
-        else:
-            sort = sort.asc()
-        query = query.order_by(sort)
+    # sort and pagination of the request, the returned Page is what list_body and list_response take
+    base_query = query
+    if args.get('count') == 'exact' and not cursor_requested(args):
+        # counted by the database in the same round trip as the page
+        query = query.add_columns(func.count().over().label('total'))
+
+    if cursor_requested(args):
+        query, keys = query_apply_cursor(model, query, args)
+        return Page(args, model, query, base_query, keys)
+
+    if args['sort']:
+        query = query.order_by(*order_clauses(order_keys(model, args['sort'])))
 
     offset = args['offset']
     limit = args['limit']
@@ -26,4 +270,105 @@ def query_apply_reqparser(model, query, args):
     elif limit:
         query = query.limit(limit)
 
-    return query
+    return Page(args, model, query, base_query)
+
+def requested_fields():
+    # ?fields=status,updated_at keeps only these keys (and id) in the output
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return frozenset(f.strip() for f in fields.split(',') if f.strip()) | {'id'}
+
+def wanted(fields, key):
+    return fields is None or key in fields
+
+def sort_fields():
+    # columns read to build a cursor, loaded even when they are not part of the fieldset
+    sort = request.args.get('sort') or (CURSOR_DEFAULT_SORT if 'cursor' in request.args else '')
+    return [key.strip().lstrip('-') for key in sort.split(',')]
+
+def query_apply_fields(model, query, fields, needed=()):
+    # unrequested columns are not selected, the serializers never touch them
+    if fields is None:
+        return query
+    needed = tuple(needed) + tuple(sort_fields())
+    columns = [c.name for c in model.__table__.columns if c.primary_key or c.name in fields or c.name in needed]
+    return query.options(load_only(*columns))
+
+def stream_requested(args):
+    stream = args.get('stream')
+    if stream is None:
+        stream = config.getConfigKey('api.stream_lists', False)
+    # pretty printed bodies (debug) and msgpack ones are always built at once
+    return stream and not (current_app.config['JSONIFY_PRETTYPRINT_REGULAR'] or current_app.debug or wants_msgpack())
+
+def stream_list(key, query, serialize, page=None):
+    # server side cursor (yield_per turns stream_results on): rows are read, serialized and sent by batches,
+    # the connection stays checked out until the last byte is sent
+    batch_size = config.getConfigKey('api.stream_batch_size', 500)
+    paginated = page is not None and page.paginated
+    limit = page_size(page.args) if paginated else None
+    count = page.count if page is not None else None
+    total = estimated_count(page.model, page.base_query) if count == 'estimated' else None
+
+    def generate():
+        chunk = [b'{' + dumpb(key) + b':[']
+        size = 0
+        separator = b''
+        read = 0
+        last = None
+        cursor = None
+        total_read = total
+        for row in query.yield_per(batch_size):
+            if count == 'exact':
+                row, total_read = split_total(row)
+            read += 1
+            if paginated and read > limit:
+                # the extra row of query_apply_cursor, the page has a next one
+                cursor = next_cursor(last, page)
+                break
+            last = row
+            item = dumpb(serialize(row))
+            chunk.append(separator + item)
+            separator = b','
+            size += len(item)
+            if size >= STREAM_CHUNK_SIZE:
+                yield b''.join(chunk)
+                chunk = []
+                size = 0
+        chunk.append(b']')
+        # known once the rows are read, after the list (json objects are unordered)
+        if paginated:
+            chunk.append(b',' + dumpb('next_cursor') + b':' + dumpb(cursor))
+        if count:
+            if total_read is None:
+                total_read = page.base_query.order_by(None).count()
+            chunk.append(b',' + dumpb('total') + b':' + dumpb(total_read))
+            chunk.append(b',' + dumpb('total_estimated') + b':' + dumpb(count == 'estimated'))
+        chunk.append(b'}\n')
+        yield b''.join(chunk)
+
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype=current_app.config['JSONIFY_MIMETYPE']
+    )
+
+def list_body(key, rows, serialize, page, entity=None):
+    # {key: [...]} of the rows of a Page, with the next_cursor of cursor pages and the total when it is asked for
+    rows, total = rows_total(rows, page)
+    body = {}
+    if page.paginated:
+        rows, body['next_cursor'] = cursor_page(rows, page, entity)
+    if page.count:
+        body['total'] = total
+        body['total_estimated'] = page.count == 'estimated'
+    body[key] = [serialize(row) for row in rows]
+    return body
+
+def list_response(key, query, serialize, page):
+    # same body as jsonify({key: [...]}), streamed when asked (stream=true or api.stream_lists),
+    # with the next_cursor of cursor pages and the total of count=
+    if stream_requested(page.args):
+        return stream_list(key, query, serialize, page)
+
+    return make_response(jsonify(list_body(key, query.all(), serialize, page)), 200)
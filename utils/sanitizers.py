@@ -1,5 +1,5 @@
 import json
-from time import strftime,gmtime
+from datetime import datetime
 
 def is_json(data):
     try:
@@ -8,11 +8,15 @@ def is_json(data):
         return False
     return True
 
+def load_data(data):
+    # bodies already decoded (msgpack, see utils.msgpack_provider.request_body) are dicts
+    return data if isinstance(data, dict) else json.loads(data)
+
 def check_data(model, data, **kwargs):
-    if not is_json(data):
+    if not isinstance(data, dict) and not is_json(data):
         return {"error": {"message": "request body must be json object"}}
 
-    data = json.loads(data)
+    data = load_data(data)
 
     data = populate_changes_dt(data)
 
@@ -67,7 +71,13 @@ def check_enum_fields(fields, data):
 
     return None
 
+def changes_dt():
+    # microseconds are kept: updated_at is the validator of conditional requests (utils.conditional),
+    # two writes in the same second must not share it
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+
 def populate_changes_dt(data):
-    data['created_at'] = strftime("%Y-%m-%d %H:%M:%S")
-    data['updated_at'] = strftime("%Y-%m-%d %H:%M:%S")
+    dt = changes_dt()
+    data['created_at'] = dt
+    data['updated_at'] = dt
     return data
@@ -0,0 +1,35 @@
+#!/usr/bin/python
+#coding: utf-8
+
+# Representations of a sequence shared by every endpoint, built on the compiled serializers of utils.model
+# list and detail take the sparse fieldset of the request (None: every field)
+#
+#   list      columns of the sequence, status as code/label
+#   detail    list without challenge_id, with the user and the challenge
+#   status    list with the celery script sent to the farmbot (status changes)
+#   nested    list with a short user, used inside challenges and users
+
+from utils.model import as_dict, serializer, unloaded_columns
+
+SEQUENCE_SPECIAL_FIELDS = {'status': 'enum'}
+
+def sequence_list(sequence, fields=None):
+    return serializer(type(sequence), unloaded_columns(type(sequence), fields), SEQUENCE_SPECIAL_FIELDS)(sequence)
+
+def sequence_detail(sequence, fields=None):
+    result = serializer(type(sequence), unloaded_columns(type(sequence), fields, ('challenge_id',)), SEQUENCE_SPECIAL_FIELDS)(sequence)
+    if fields is None or 'user' in fields:
+        result['user'] = sequence.user.as_dict()
+    if fields is None or 'challenge' in fields:
+        result['challenge'] = sequence.challenge.as_dict()
+    return result
+
+def sequence_status(sequence, celery=None):
+    result = sequence_list(sequence)
+    result['celery'] = celery if celery else None
+    return result
+
+def sequence_nested(sequence, unloaded_fields=None):
+    result = serializer(type(sequence), unloaded_fields, SEQUENCE_SPECIAL_FIELDS)(sequence)
+    result['user'] = as_dict(sequence.user, unloaded_fields=['password', 'role'], special_fields={'role': 'enum'})
+    return result